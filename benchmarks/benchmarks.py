@@ -2,7 +2,12 @@
 # See "Writing benchmarks" in the asv docs for more information.
 
 import liionpack as lp
+from liionpack.solver_utils import _mapped_step
 import pybamm
+import numpy as np
+import os
+import shutil
+import tempfile
 
 
 class BasicBenchmark:
@@ -127,3 +132,210 @@ class LargePack:
             initial_soc=0.5,
             nproc=2,
         )
+
+
+class MapBackends:
+    # Time a single mapped step to show where threads start to pay off
+    timeout = 300
+    params = ([4, 32, 256, 1024], ["auto", "serial", "thread", "openmp"], [None, 8])
+    param_names = ["Nspm", "parallelization", "chunk_size"]
+
+    def setup(self, Nspm, parallelization, chunk_size):
+        parameter_values = pybamm.ParameterValues("Chen2020")
+        parameter_values.update({"Current function [A]": "[input]"})
+        sim = lp.basic_simulation(parameter_values)
+        self.inputs = lp.build_inputs_dict(np.ones(Nspm), None, None)
+        nproc = os.cpu_count() or 1
+        map_options = {"parallelization": parallelization, "chunk_size": chunk_size}
+        objs = lp.my_cco(
+            self.inputs,
+            sim,
+            10.0,
+            Nspm,
+            nproc,
+            ["Terminal voltage [V]", "Surface open-circuit voltage [V]"],
+            True,
+            None,
+            map_options=map_options,
+        )
+        self.model = sim.built_model
+        self.objs = objs
+
+    def time_mapped_step(self, Nspm, parallelization, chunk_size):
+        _mapped_step(
+            self.model,
+            self.objs["initial_solutions"],
+            self.inputs,
+            self.objs["integrator"],
+            self.objs["variables_fn"],
+            self.objs["t_eval"],
+            self.objs["events_fn"],
+            10.0,
+        )
+
+
+class CircuitSetup:
+    # Building and reading the netlist as the pack grows
+    params = ([(4, 2), (16, 10), (64, 10), (128, 20)],)
+    param_names = ["Np, Ns"]
+
+    def setup(self, size):
+        Np, Ns = size
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "pack.txt")
+        lp.write_netlist(lp.setup_circuit(Np=Np, Ns=Ns), self.filename)
+
+    def teardown(self, size):
+        shutil.rmtree(self.directory)
+
+    def time_setup_circuit(self, size):
+        Np, Ns = size
+        lp.setup_circuit(Np=Np, Ns=Ns)
+
+    def time_read_netlist(self, size):
+        lp.read_netlist(self.filename, Ri=1e-2, Rc=1e-2, Rb=1e-4, Rt=1e-5, I=80, V=4.2)
+
+
+class SolveCircuit:
+    # A single circuit solve with current or power control
+    params = ([(4, 2), (16, 10), (64, 10), (128, 20)], ["current", "power"])
+    param_names = ["Np, Ns", "control"]
+
+    def setup(self, size, control):
+        Np, Ns = size
+        self.netlist = lp.setup_circuit(Np=Np, Ns=Ns, V=3.6)
+        self.value = 10.0 * Np
+        if control == "power":
+            self.value *= 3.6 * Ns
+
+    def time_solve_circuit(self, size, control):
+        lp.solve_circuit(self.netlist, **{control: self.value})
+
+
+class ActorStep:
+    # Setting up an actor and stepping its batteries with the serial and
+    # mapped step functions, actors with more than one process are mapped
+    timeout = 300
+    params = ([4, 32, 128], ["serial", "mapped"])
+    param_names = ["Nspm", "path"]
+
+    def setup(self, Nspm, path):
+        self.parameter_values = pybamm.ParameterValues("Chen2020")
+        self.parameter_values.update({"Current function [A]": "[input]"})
+        self.inputs = lp.build_inputs_dict(np.ones(Nspm), None, None)
+        self.nproc = 1 if path == "serial" else 2
+        self.actor = self.new_actor(Nspm)
+        self.actor.evaluate(self.inputs)
+
+    def new_actor(self, Nspm):
+        actor = lp.GenericActor()
+        actor.setup(
+            Nspm=Nspm,
+            sim_func=None,
+            parameter_values=self.parameter_values.copy(),
+            dt=10.0,
+            inputs=self.inputs,
+            variable_names=["Terminal voltage [V]", "Surface open-circuit voltage [V]"],
+            initial_soc=0.5,
+            nproc=self.nproc,
+            simlist=None,
+        )
+        return actor
+
+    def time_actor_setup(self, Nspm, path):
+        self.new_actor(Nspm)
+
+    def time_actor_step(self, Nspm, path):
+        self.actor.step(self.inputs, 10.0)
+
+
+class Managers:
+    # The same pack stepped by a single casadi actor or by two Ray actors,
+    # including starting and stopping Ray
+    timeout = 600
+    params = (["casadi", "ray"],)
+    param_names = ["manager"]
+
+    def setup(self, manager):
+        self.netlist = lp.setup_circuit(Np=16, Ns=2, Rb=1e-4, Rc=1e-2)
+        self.parameter_values = pybamm.ParameterValues("Chen2020")
+        self.experiment = pybamm.Experiment(
+            ["Discharge at 16 A for 5 minutes"], period="10 seconds"
+        )
+
+    def time_discharge_2cpu(self, manager):
+        lp.solve(
+            netlist=self.netlist.copy(),
+            parameter_values=self.parameter_values.copy(),
+            experiment=self.experiment,
+            initial_soc=0.5,
+            nproc=2,
+            manager=manager,
+            progress=False,
+        )
+
+
+class OutputMemory:
+    # Peak memory of the output buffers for each recording policy. The
+    # storage is set up and filled by recording a synthetic pack state at
+    # every step without solving, so that the buffers and not the models
+    # dominate the peak
+    timeout = 600
+    params = (["full", "every", "summary", "memmap"],)
+    param_names = ["recording"]
+    Nspm = 2000
+    Nsteps = 20000
+
+    def setup(self, recording):
+        self.directory = tempfile.mkdtemp()
+        self.record_options = {
+            "every": 1,
+            "cells": None,
+            "nodes": None,
+            "trigger": None,
+            "summary": False,
+            "percentiles": [5, 50, 95],
+        }
+        self.output_sink = lp.MemorySink()
+        if recording == "every":
+            self.record_options["every"] = 10
+        elif recording == "summary":
+            self.record_options["summary"] = True
+        elif recording == "memmap":
+            self.output_sink = lp.MemmapSink(self.directory)
+
+    def teardown(self, recording):
+        shutil.rmtree(self.directory)
+
+    def peakmem_record(self, recording):
+        rm = lp.CasadiManager()
+        rm.record_options = self.record_options
+        rm.output_sink = self.output_sink
+        rm.Nspm = self.Nspm
+        rm.Nnodes = self.Nspm + 1
+        rm.Nsteps = self.Nsteps
+        rm.variable_names = ["Terminal voltage [V]", "Surface open-circuit voltage [V]"]
+        rm.Nvar = len(rm.variable_names)
+        rm.integrator_stats = False
+        rm._setup_recording()
+        rm._setup_storage()
+        rm.substep = 0
+        rm.period_step = 0
+        rm.last_recorded_step = -1
+        rm.record_index = 0
+        rm.storage_full = False
+        rm.trigger_steps = 0
+        rm.cell_stats = None
+        rm.time = 0.0
+        rm.pack_current, rm.pack_voltage, rm.pack_power = 1.0, 3.6, 3.6
+        rng = np.random.default_rng(0)
+        rm.V_node = rng.random(rm.Nnodes)
+        rm.cell_current = rng.random(self.Nspm).astype(np.float32)
+        rm.temp_Ri = rng.random(self.Nspm)
+        rm.cell_output = rng.random((rm.Nvar, self.Nspm)).astype(np.float32)
+        for step in range(self.Nsteps):
+            rm._record_step()
+            rm.period_step += 1
+            rm.time += 10.0
+            rm.output_sink.step(step + 1)
+        rm.output_sink.finalize()
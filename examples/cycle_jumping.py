@@ -0,0 +1,71 @@
+"""
+Example of a long SEI degradation study using cycle jumping. Blocks of cycles
+are simulated in full and the drift in the states of each battery is
+extrapolated over the cycles in between.
+"""
+
+import liionpack as lp
+import pybamm
+import matplotlib.pyplot as plt
+
+
+def SEI_degradation(parameter_values=None):
+    model = pybamm.lithium_ion.SPM(
+        options={
+            "SEI": "ec reaction limited",
+            "SEI film resistance": "distributed",
+            "SEI porosity change": "true",
+        }
+    )
+    model = lp.add_events_to_model(model)
+    if parameter_values is None:
+        parameter_values = pybamm.ParameterValues("Chen2020")
+    solver = pybamm.CasadiSolver(mode="safe")
+    sim = pybamm.Simulation(
+        model=model,
+        parameter_values=parameter_values,
+        solver=solver,
+    )
+    return sim
+
+
+# Generate the netlist
+netlist = lp.setup_circuit(Np=4, Ns=1, Rb=1.5e-3, Rc=1e-2, Ri=5e-2, V=4.0, I=30.0)
+
+# A single cycle of the experiment
+cycle = pybamm.Experiment(
+    [
+        "Charge at 15 A for 10 minutes",
+        "Rest for 10 minutes",
+        "Discharge at 15 A for 10 minutes",
+        "Rest for 10 minutes",
+    ],
+    period="30 seconds",
+)
+
+output_variables = ["Loss of capacity to negative SEI [A.h]"]
+parameter_values = pybamm.ParameterValues("Chen2020")
+
+# Solve 500 cycles, only a fraction of which are integrated
+outputs = lp.solve_cycles(
+    netlist=netlist,
+    sim_func=SEI_degradation,
+    parameter_values=parameter_values,
+    experiment=cycle,
+    n_cycles=500,
+    output_variables=output_variables,
+    initial_soc=0.5,
+    jump_options={
+        "max_jump": 100,
+        "rtol": 1e-2,
+        # Only the slow SEI growth is extrapolated between cycles
+        "variables": ["Negative total SEI thickness [m]"],
+    },
+)
+
+cycles = sorted(outputs.keys())
+loss = [outputs[c][output_variables[0]][-1, :] for c in cycles]
+plt.plot(cycles, loss, "o-")
+plt.xlabel("Cycle number")
+plt.ylabel(output_variables[0])
+plt.show()
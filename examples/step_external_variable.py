@@ -53,6 +53,7 @@ rm.solve(
     inputs=inputs,
     nproc=2,
     initial_soc=0.5,
+    simlist=None,
     setup_only=True,
 )
 
@@ -61,22 +62,21 @@ def external_stepper(manager, T0):
     tic = ticker.time()
     # Do stepping
     lp.logger.notice("Starting step solve")
-    vlims_ok = True
-    input_temperature = np.ones(Nspm) * T0
-    with tqdm(total=manager.Nsteps, desc="Stepping simulation") as pbar:
-        step = 0
-        while step < manager.Nsteps and vlims_ok:
-            input_temperature += 0.1
-            inputs.update({"Input temperature [K]": input_temperature})
-            vlims_ok = manager._step(step, inputs)
-            step += 1
+    # The model inputs for each step, one row for each input
+    input_array = np.ones([1, Nspm]) * T0
+    protocol = manager.flattened_protocol
+    with tqdm(total=len(protocol), desc="Stepping simulation") as pbar:
+        for current in protocol:
+            input_array += 0.1
+            manager.step(current, input_array)
             pbar.update(1)
-    manager.step = step
+            if not manager.vlims_ok:
+                break
     toc = ticker.time()
     lp.logger.notice("Step solve finished")
     lp.logger.notice("Total stepping time " + str(np.around(toc - tic, 3)) + "s")
     lp.logger.notice(
-        "Time per step " + str(np.around((toc - tic) / manager.Nsteps, 3)) + "s"
+        "Time per step " + str(np.around((toc - tic) / len(protocol), 3)) + "s"
     )
 
 
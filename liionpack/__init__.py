@@ -10,11 +10,14 @@ from .simulations import basic_simulation
 from .simulations import thermal_simulation
 from .simulations import thermal_external
 from .utils import interp_current
+from .utils import resample
 from .utils import build_inputs_dict
 from .utils import add_events_to_model
 from .utils import save_to_csv
 from .utils import save_to_npy
 from .utils import save_to_npzcomp
+from .utils import save_to_parquet
+from .utils import save_to_hdf5
 from .netlist_utils import read_netlist
 from .netlist_utils import setup_circuit
 from .netlist_utils import solve_circuit
@@ -24,7 +27,10 @@ from .netlist_utils import power_loss
 from .netlist_utils import write_netlist
 from .sim_utils import get_initial_stoichiometries
 from .sim_utils import update_init_conc
+from .sim_utils import get_state_indices
 from .solver_utils import solve
+from .solver_utils import solve_cycles
+from .solver_utils import resume
 from .protocols import generate_protocol_from_experiment
 from .plots import draw_circuit
 from .plots import plot_pack
@@ -42,8 +48,14 @@ from .definitions import MODULE_DIR
 from .definitions import CIRCUIT_DIR
 from .solvers import CasadiManager
 from .solvers import RayManager
+from .solvers import ProcessPoolManager
 from .solvers import GenericActor
 from .solvers import RayActor
 from .solvers import my_cco
+from .session import PackSession
+from .output import MemorySink
+from .output import MemmapSink
+from .output import load_output
+from .profiler import Profiler
 
 from ._version import __version__
@@ -6,6 +6,7 @@ import os
 import pybamm
 import scipy as sp
 from lcapy import Circuit
+from liionpack.profiler import _NULL_PROFILER
 
 
 def read_netlist(
@@ -337,7 +338,7 @@ def setup_circuit(
     return netlist
 
 
-def solve_circuit(netlist, current=None, power=None):
+def solve_circuit(netlist, current=None, power=None, profiler=None):
     """
     Generate and solve the Modified Nodal Analysis (MNA) equations for the circuit.
     The MNA equations are a linear system Ax = z.
@@ -350,6 +351,9 @@ def solve_circuit(netlist, current=None, power=None):
             The current value for the current source. Overrides the netlist value.
         power (float):
             The power value for the power source. Overrides the netlist value.
+        profiler (liionpack.Profiler):
+            Records the time spent assembling, factorising and solving the
+            circuit. Default is None.
 
     Returns:
         V_node (np.ndarray):
@@ -368,7 +372,10 @@ def solve_circuit(netlist, current=None, power=None):
     if control_args == 2:
         raise ValueError("Only specify one of current or power arguments.")
 
+    if profiler is None:
+        profiler = _NULL_PROFILER
     timer = pybamm.Timer()
+    tic = profiler.start()
 
     desc = np.array(netlist["desc"]).astype("<U1")  # just take first character
     I_map = desc == "I"
@@ -433,16 +440,24 @@ def solve_circuit(netlist, current=None, power=None):
     upper = sp.sparse.hstack((G, B))
     lower = sp.sparse.hstack((B.T, D))
     A = sp.sparse.vstack((upper, lower))
-    A_csr = sp.sparse.csr_matrix(A)
+    A_csc = sp.sparse.csc_matrix(A)
 
     n1 = node1[I_map]
     n2 = node2[I_map]
+    profiler.stop("circuit assembly", tic)
+
+    # Factorise once so that the power iterations only repeat the solve
+    tic = profiler.start()
+    lu = sp.sparse.linalg.splu(A_csc)
+    profiler.stop("circuit factorisation", tic)
 
     toc_setup = timer.time()
-    lp.logger.debug(f"Circuit set up in {toc_setup}")
+    lp.logger.debug("Circuit set up in %s", toc_setup)
 
-    def _solve(A_csr, z, n):
-        X = sp.sparse.linalg.spsolve(A_csr, z).flatten()
+    def _solve(lu, z, n):
+        tic = profiler.start()
+        X = lu.solve(z).flatten()
+        profiler.stop("circuit solve", tic)
         V_node = np.zeros(n + 1)
         V_node[1:] = X[:n]
         I_batt = X[n:]
@@ -459,7 +474,7 @@ def solve_circuit(netlist, current=None, power=None):
         if n2 >= 0:
             i[n2] = i[n2] + current
         z = np.vstack((i, e))
-        V_node, I_batt = _solve(A_csr, z, n)
+        V_node, I_batt = _solve(lu, z, n)
         netlist.loc[I_map, ("value")] = current
 
     elif power is not None:
@@ -474,7 +489,7 @@ def solve_circuit(netlist, current=None, power=None):
             if n2 >= 0:
                 i[n2] = i[n2] + current_guess
             z = np.vstack((i, e))
-            V_node, I_batt = _solve(A_csr, z, n)
+            V_node, I_batt = _solve(lu, z, n)
             V_Terminal = V_node[Terminal_Node]
             power_guess = V_Terminal * current_guess
             if abs(power_guess - power) < tolerance:
@@ -489,8 +504,8 @@ def solve_circuit(netlist, current=None, power=None):
     terminal_power = terminal_voltage * terminal_current
 
     toc = timer.time()
-    lp.logger.debug(f"Circuit solved in {toc - toc_setup}")
-    lp.logger.info(f"Circuit set up and solved in {toc}")
+    lp.logger.debug("Circuit solved in %s", toc - toc_setup)
+    lp.logger.info("Circuit set up and solved in %s", toc)
     return V_node, I_batt, terminal_current, terminal_voltage, terminal_power
 
 
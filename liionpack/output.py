@@ -0,0 +1,270 @@
+#
+# Storage for the simulation output
+#
+
+import numpy as np
+import json
+import os
+import pathlib
+from collections.abc import Mapping
+
+
+class MemorySink:
+    """
+    Store the simulation output in memory. This is the default sink and the
+    arrays returned by the manager are ordinary numpy arrays.
+    """
+
+    def allocate(self, name, shape, dtype=np.float32):
+        """
+        Create a zeroed array to hold one output quantity for every step
+
+        Args:
+            name (str):
+                Name of the quantity, e.g. "output" or "node_voltages".
+            shape (tuple):
+                The shape of the array, the step is the first axis apart from
+                the cell variables which are [# variables, # steps, # cells].
+            dtype (np.dtype):
+                The data type of the array.
+
+        Returns:
+            array (np.ndarray):
+                The storage array.
+        """
+        return np.zeros(shape, dtype=dtype)
+
+    def step(self, global_step):
+        """
+        Called by the manager after every recorded step.
+
+        Args:
+            global_step (int):
+                The number of steps recorded so far.
+        """
+        pass
+
+    def finalize(self):
+        """
+        Called by the manager when the output is collected.
+        """
+        pass
+
+
+class MemmapSink(MemorySink):
+    """
+    Stream the simulation output to memory-mapped .npy files so that the
+    memory used by the output is bounded by the operating system page cache
+    rather than growing with the number of steps. The arrays returned by the
+    manager are np.memmap views on the files which are only read from disk
+    when accessed, and each file can be re-opened after the solve with
+    np.load(filename, mmap_mode="r").
+
+    Args:
+        directory (str):
+            The directory to write the files to, it is created if it does not
+            exist.
+        flush_interval (int):
+            The number of steps between flushing the written data to disk.
+            Default is 100.
+    """
+
+    def __init__(self, directory, flush_interval=100):
+        self.directory = str(directory)
+        self.flush_interval = max(int(flush_interval), 1)
+        self.arrays = []
+        self.filenames = []
+        self.counts = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def allocate(self, name, shape, dtype=np.float32):
+        if np.prod(shape) == 0:
+            # An empty file can not be memory mapped
+            return np.zeros(shape, dtype=dtype)
+        # The storage is re-allocated when experiments are continued so
+        # number every allocation after the first
+        count = self.counts.get(name, 0)
+        self.counts[name] = count + 1
+        if count > 0:
+            name = name + "_" + str(count)
+        filename = os.path.join(self.directory, name + ".npy")
+        array = np.lib.format.open_memmap(filename, mode="w+", dtype=dtype, shape=shape)
+        self.arrays.append(array)
+        self.filenames.append(filename)
+        return array
+
+    def step(self, global_step):
+        if global_step % self.flush_interval == 0:
+            self.flush()
+
+    def finalize(self):
+        self.flush()
+
+    def flush(self):
+        """
+        Write any modified data in the memory-mapped arrays to disk.
+        """
+        for array in self.arrays:
+            array.flush()
+
+
+class _ParquetArray:
+    """
+    A variable in a Parquet file that is read when it is indexed. Indexing
+    along the steps only reads the row groups that hold the requested steps.
+    """
+
+    def __init__(self, filename):
+        import pyarrow.parquet as pq
+
+        self.file = pq.ParquetFile(filename)
+        metadata = self.file.schema_arrow.metadata
+        self.name = metadata[b"name"].decode()
+        self.shape = tuple(json.loads(metadata[b"shape"]))
+        self.ndim = len(self.shape)
+        dtype = self.file.schema_arrow.field("values").type
+        if self.ndim > 1 and np.prod(self.shape[1:]) > 0:
+            dtype = dtype.value_type
+        self.dtype = np.dtype(dtype.to_pandas_dtype())
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _read_rows(self, start, stop):
+        # Read the row groups that overlap the rows start to stop
+        meta = self.file.metadata
+        groups = []
+        first = None
+        row = 0
+        for i in range(meta.num_row_groups):
+            n = meta.row_group(i).num_rows
+            if row + n > start and row < stop:
+                groups.append(i)
+                if first is None:
+                    first = row
+            row += n
+        if len(groups) == 0:
+            return np.zeros((0,) + self.shape[1:], dtype=self.dtype)
+        column = self.file.read_row_groups(groups, columns=["values"]).column(0)
+        if self.ndim > 1:
+            values = column.combine_chunks().flatten().to_numpy()
+        else:
+            values = column.to_numpy()
+        values = values.reshape((-1,) + self.shape[1:])
+        return values[start - first : stop - first]
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        steps = index[0]
+        if isinstance(steps, slice):
+            start, stop, stride = steps.indices(self.shape[0])
+            if stride > 0 and start < stop:
+                rows = self._read_rows(start, stop)
+                return rows[(slice(None, None, stride),) + index[1:]]
+        elif isinstance(steps, (int, np.integer)):
+            step = range(self.shape[0])[steps]
+            return self._read_rows(step, step + 1)[(0,) + index[1:]]
+        return self[:][index]
+
+    def __array__(self, dtype=None, copy=None):
+        values = self._read_rows(0, self.shape[0])
+        if dtype is not None:
+            values = values.astype(dtype)
+        return values
+
+
+class LazyOutput(Mapping):
+    """
+    Read-only dictionary-like access to saved simulation output, created with
+    `load_output`. Variables are memory-mapped or read from the file when they
+    are accessed and can be indexed to read a slice of the steps, use
+    np.asarray to read a whole variable into memory.
+
+    Args:
+        path (str):
+            A folder of `.npy` or `.parquet` files, or an `.npz` or `.h5` file.
+    """
+
+    def __init__(self, path):
+        path = pathlib.Path(path)
+        self.file = None
+        self.variables = {}
+        if path.is_dir():
+            if any(path.glob("*.parquet")):
+                for filename in sorted(path.glob("*.parquet")):
+                    variable = _ParquetArray(filename)
+                    self.variables[variable.name] = variable
+                return
+            if any(path.glob("*.npy")):
+                # File names can't hold every character of the variable names
+                # so the names are restored from the list saved with them
+                names = {}
+                if (path / "variables.json").is_file():
+                    with open(path / "variables.json") as f:
+                        names = json.load(f)
+                for filename in sorted(path.glob("*.npy")):
+                    name = names.get(filename.stem, filename.stem)
+                    self.variables[name] = np.load(filename, mmap_mode="r")
+                return
+            for name in ["output.h5", "output.npz"]:
+                if (path / name).is_file():
+                    path = path / name
+                    break
+        if path.suffix == ".npz":
+            # Each variable is decompressed when it is accessed
+            self.file = np.load(path)
+            for key in self.file.files:
+                self.variables[key] = None
+        elif path.suffix in [".h5", ".hdf5"]:
+            import h5py
+
+            self.file = h5py.File(path, "r")
+            for dset in self.file.values():
+                self.variables[dset.attrs.get("name", dset.name[1:])] = dset
+        else:
+            raise ValueError("No simulation output found at " + str(path))
+
+    def __getitem__(self, key):
+        value = self.variables[key]
+        if value is None:
+            value = self.file[key]
+        return value
+
+    def __iter__(self):
+        return iter(self.variables)
+
+    def __len__(self):
+        return len(self.variables)
+
+    def close(self):
+        """
+        Close the underlying file.
+        """
+        if self.file is not None:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def load_output(path):
+    """
+    Load simulation output saved with `save_to_npy`, `save_to_npzcomp`,
+    `save_to_parquet` or `save_to_hdf5` without reading it all into memory.
+
+    Args:
+        path (str):
+            A folder of `.npy` or `.parquet` files, or an `.npz` or `.h5` file
+            or the folder containing it.
+
+    Returns:
+        output (LazyOutput):
+            A dictionary-like object with a key for each output variable. The
+            values are read when they are accessed and slices of the steps,
+            e.g. output["Cell current [A]"][100:200], only read those steps.
+    """
+    return LazyOutput(path)
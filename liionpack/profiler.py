@@ -0,0 +1,194 @@
+#
+# Profiling of the phases of a solve
+#
+
+import numpy as np
+import json
+import time as ticker
+
+
+class Profiler:
+    """
+    Accumulates the wall time of each phase of a solve, e.g. "setup",
+    "circuit solve" or "integration", and counters such as the integrator
+    steps of each step. A profiler is created by a solve with profile=True
+    and can be summarised or exported after the solve.
+    """
+
+    def __init__(self):
+        self.origin = ticker.perf_counter()
+        self.names = []
+        self.starts = []
+        self.durations = []
+        self.threads = []
+        self.counters = {}
+        self.counter_times = {}
+
+    def start(self):
+        """
+        Returns:
+            start (float):
+                The time to pass to `stop` at the end of the phase.
+        """
+        return ticker.perf_counter()
+
+    def stop(self, name, start):
+        """
+        Record a phase that began at start and ends now.
+
+        Args:
+            name (str):
+                The name of the phase.
+            start (float):
+                The time returned by `start` at the beginning of the phase.
+        """
+        self.add(name, ticker.perf_counter() - start, start)
+
+    def add(self, name, duration, start=None, thread=0):
+        """
+        Record a phase with a duration measured elsewhere, e.g. by an actor.
+
+        Args:
+            name (str):
+                The name of the phase.
+            duration (float):
+                The wall time of the phase (s).
+            start (float):
+                The time the phase began. Default is None in which case it
+                ended now.
+            thread (int):
+                The row of the trace the phase is drawn on. Default is 0.
+        """
+        if start is None:
+            start = ticker.perf_counter() - duration
+        self.names.append(name)
+        self.starts.append(start)
+        self.durations.append(duration)
+        self.threads.append(thread)
+
+    def count(self, name, value):
+        """
+        Record the value of a counter, e.g. the integrator steps of a step.
+
+        Args:
+            name (str):
+                The name of the counter.
+            value (float):
+                The value.
+        """
+        if name not in self.counters:
+            self.counters[name] = []
+            self.counter_times[name] = []
+        self.counters[name].append(float(value))
+        self.counter_times[name].append(ticker.perf_counter())
+
+    def summary(self):
+        """
+        Returns:
+            summary (dict):
+                For each phase the "count", "total", "mean", "min", "max",
+                "p50", "p90" and "p99" wall times (s) in order of the first
+                time each phase was recorded, followed by the same statistics
+                of the values of each counter.
+        """
+        names = np.array(self.names)
+        durations = np.array(self.durations)
+        summary = {}
+        for name in dict.fromkeys(self.names):
+            summary[name] = _statistics(durations[names == name])
+        for name, values in self.counters.items():
+            summary[name] = _statistics(np.array(values))
+        return summary
+
+    def to_json(self, filename=None):
+        """
+        Export the summary as JSON.
+
+        Args:
+            filename (str):
+                The file to write to. Default is None in which case the JSON
+                is only returned.
+
+        Returns:
+            summary (str):
+                The summary as a JSON string.
+        """
+        text = json.dumps(self.summary(), indent=2)
+        if filename is not None:
+            with open(filename, "w") as f:
+                f.write(text)
+        return text
+
+    def to_chrome_trace(self, filename):
+        """
+        Export every recorded phase and counter value in the Chrome trace
+        event format, which can be opened in chrome://tracing or
+        https://ui.perfetto.dev
+
+        Args:
+            filename (str):
+                The file to write to.
+        """
+        events = []
+        for name, start, duration, thread in zip(
+            self.names, self.starts, self.durations, self.threads
+        ):
+            events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - self.origin) * 1e6,
+                    "dur": duration * 1e6,
+                    "pid": 0,
+                    "tid": thread,
+                }
+            )
+        for name, values in self.counters.items():
+            for time, value in zip(self.counter_times[name], values):
+                events.append(
+                    {
+                        "name": name,
+                        "ph": "C",
+                        "ts": (time - self.origin) * 1e6,
+                        "pid": 0,
+                        "args": {name: value},
+                    }
+                )
+        with open(filename, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def _statistics(values):
+    # The statistics reported for each phase and counter
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        "count": len(values),
+        "total": float(values.sum()),
+        "mean": float(values.mean()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "p50": float(p50),
+        "p90": float(p90),
+        "p99": float(p99),
+    }
+
+
+class _NullProfiler:
+    """
+    Stands in for a profiler when a solve is not profiled.
+    """
+
+    def start(self):
+        return 0.0
+
+    def stop(self, name, start):
+        pass
+
+    def add(self, name, duration, start=None, thread=0):
+        pass
+
+    def count(self, name, value):
+        pass
+
+
+_NULL_PROFILER = _NullProfiler()
@@ -2,12 +2,16 @@ import numpy as np
 import pybamm
 
 
-def generate_protocol_from_experiment(experiment):
+def generate_protocol_from_experiment(experiment, include_initial_state=True):
     """
 
     Args:
         experiment (pybamm.Experiment):
             The experiment to generate the protocol from.
+        include_initial_state (bool):
+            Repeat the first value of the first operation so that the initial
+            state is included. Set to False when continuing from a previous
+            experiment. The default is True.
 
     Returns:
         protocol (list):
@@ -31,7 +35,7 @@ def generate_protocol_from_experiment(experiment):
             if not isinstance(step.value, pybamm.Interpolant):
                 I = step.value
                 proto.extend([I] * int(np.round(t, 5) / np.round(dt, 5)))
-                if i == 0:
+                if i == 0 and include_initial_state:
                     # Include initial state when not drive cycle, first op
                     proto = [proto[0]] + proto
             else:
@@ -0,0 +1,141 @@
+#
+# A pack that is run with a sequence of experiments
+#
+
+import liionpack as lp
+import numpy as np
+
+
+class PackSession:
+    """
+    A pack that keeps its actors and the state of its batteries between
+    experiments, so that experiments decided at runtime can be run one after
+    the other from the final state of the last one. The actors are set up by
+    the first call to run and are reused by every call after it.
+
+    Args:
+        netlist (pandas.DataFrame):
+            A netlist of circuit elements with format. desc, node1, node2, value.
+            Produced by liionpack.read_netlist or liionpack.setup_circuit
+        parameter_values (pybamm.ParameterValues):
+            A dictionary of all the model parameters
+        sim_func (function):
+            A function containing model and solver definitions that accepts
+            parameter_values and returns a simulation. The default is None.
+        inputs (dict):
+            Dictionary for every model input with value for each battery.
+            The default is None.
+        output_variables (list):
+            Variables to evaluate during solve. Must be a 0D variable i.e.
+            battery wide volume average - or X-averaged for 1D model. The
+            default is None.
+        initial_soc (float):
+            The initial state of charge for every battery. The default is None
+            in which case concentrations set in the parameter_values are used.
+        nproc (int or tuple):
+            Number of processes to start in parallel for mapping. The default
+            is 1.
+        manager (string or liionpack manager):
+            The solver manager to use, "casadi", "ray" or "process", or a
+            manager instance. The default is "casadi".
+        **solve_options:
+            Further keyword arguments passed to the solve method of the
+            manager, e.g. adaptive or record_options.
+    """
+
+    def __init__(
+        self,
+        netlist,
+        parameter_values,
+        sim_func=None,
+        inputs=None,
+        output_variables=None,
+        initial_soc=None,
+        nproc=1,
+        manager="casadi",
+        **solve_options,
+    ):
+        if manager == "casadi":
+            manager = lp.CasadiManager()
+        elif manager == "ray":
+            manager = lp.RayManager()
+        elif manager == "process":
+            manager = lp.ProcessPoolManager()
+        elif isinstance(manager, str):
+            raise ValueError("manager must be casadi, ray or process")
+        self.manager = manager
+        self.netlist = netlist
+        self.parameter_values = parameter_values
+        self.sim_func = sim_func
+        self.inputs = inputs
+        self.output_variables = output_variables
+        self.initial_soc = initial_soc
+        self.nproc = nproc
+        self.solve_options = solve_options
+        self.started = False
+        self.time = 0.0
+        self.outputs = []
+
+    def run(self, experiment):
+        """
+        Run an experiment starting from the final state of the last one.
+
+        Args:
+            experiment (pybamm.Experiment):
+                The experiment to run.
+
+        Returns:
+            output (dict):
+                The output of this experiment with the time measured from the
+                start of the first experiment.
+        """
+        rm = self.manager
+        if not self.started:
+            rm.solve(
+                netlist=self.netlist,
+                sim_func=self.sim_func,
+                parameter_values=self.parameter_values,
+                experiment=experiment,
+                inputs=self.inputs,
+                output_variables=self.output_variables,
+                initial_soc=self.initial_soc,
+                nproc=self.nproc,
+                simlist=None,
+                setup_only=True,
+                **self.solve_options,
+            )
+            self.started = True
+            rm.run_protocol()
+        else:
+            rm.continue_protocol(experiment)
+        output = dict(rm.collect_output())
+        output["Time [s]"] = output["Time [s]"] + np.float32(self.time)
+        self.time += rm.time
+        self.outputs.append(output)
+        return output
+
+    @property
+    def output(self):
+        """
+        The output of every experiment run so far joined in order.
+        """
+        if len(self.outputs) == 0:
+            return {}
+        return {
+            key: np.concatenate([output[key] for output in self.outputs])
+            for key in self.outputs[0].keys()
+        }
+
+    def close(self):
+        """
+        Shut down the actors of the session.
+        """
+        if self.started:
+            self.manager.cleanup()
+            self.started = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
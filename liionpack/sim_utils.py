@@ -65,3 +65,33 @@ def update_init_conc(param, SoC=None, update=True):
             }
         )
     return c_s_n_init, c_s_p_init
+
+
+def get_state_indices(model, variable_names=None):
+    """
+    Find the indices of the states in the state vector of a built model that a
+    set of variables depend on
+
+    Args:
+        model (pybamm.lithium_ion.BaseModel):
+            The built battery model.
+        variable_names (list):
+            Variables to find the states for. Must be a valid key in the
+            model.variables. The default is None in which case the indices of
+            all the differential states are returned.
+
+    Returns:
+        indices (np.ndarray):
+            The sorted indices of the states in the state vector.
+    """
+    if variable_names is None:
+        return np.arange(model.concatenated_rhs.size)
+    indices = []
+    for name in variable_names:
+        for symbol in model.variables[name].pre_order():
+            if isinstance(symbol, pybamm.StateVector):
+                for y_slice in symbol.y_slices:
+                    indices.extend(range(y_slice.start, y_slice.stop))
+    if len(indices) == 0:
+        raise ValueError("No states found for variables " + str(variable_names))
+    return np.unique(indices)
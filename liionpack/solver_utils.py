@@ -6,9 +6,21 @@ import casadi
 import pybamm
 import numpy as np
 import liionpack as lp
+import os
+import time as ticker
 
+# Statistics of the casadi integrators reported for each battery, the number
+# of steps, Newton iterations, error test failures and Jacobian evaluations
+_INTEGRATOR_STATS = ["nsteps", "nniters", "netfails", "n_call_jacF"]
 
-def _serial_eval(model, solutions, inputs_dict, variables, t_eval):
+
+def _inputs_array(inputs_dict):
+    # The inputs of each battery as the columns of an array, with the rows in
+    # the order of the integrator parameters
+    return np.array([list(inpt.values()) for inpt in inputs_dict], dtype=float).T
+
+
+def _serial_eval(model, solutions, inputs, variables, t_eval):
     """
     Internal function to evaluate the model variables in a serial way.
 
@@ -18,13 +30,15 @@ def _serial_eval(model, solutions, inputs_dict, variables, t_eval):
         solutions (iter of pybamm.Solution):
             Used to get the last state of the system and use as x0 and z0 for the
             casadi integrator. Provide solution objects for each battery.
-        inputs_dict (iter of input_dicts):
-            Provide inputs_dict objects for each battery.
+        inputs (np.ndarray):
+            The inputs of each battery in its column, with shape
+            [# inputs, # batteries] and the rows in the order of the
+            integrator parameters.
         variables (variables evaluator):
-            Produced by _create_casadi_objects when mapped = False
+            Produced by `liionpack.solvers.my_cco` when mapped = False
         t_eval (np.ndarray):
             A float array of times to evaluate.
-            Produced by _create_casadi_objects when mapped = False
+            Produced by `liionpack.solvers.my_cco` when mapped = False
 
     Returns:
         sol (list):
@@ -35,26 +49,33 @@ def _serial_eval(model, solutions, inputs_dict, variables, t_eval):
     """
     len_rhs = model.concatenated_rhs.size
     N = len(solutions)
-    print("N in serial_eval:", N)
-    t_min = 0.0
+    lp.logger.debug("Serial eval of %d batteries", N)
+    p = casadi.DM(inputs)
     var_eval = []
     for k in range(N):
         if solutions[k] is None:
             # First pass
-            print("First pass triggered, serial eval")
+            lp.logger.debug("First pass triggered, serial eval")
             xend = model.y0[:len_rhs]
         else:
             xend = solutions[k].y[:, -1]
-
-        temp = inputs_dict[k]
-        inputs = casadi.vertcat(*[x for x in temp.values()] + [t_min])
-        ninputs = len(temp.values())
-        var_eval.append(variables(0, xend[:len_rhs], xend[len_rhs:], inputs[0:ninputs]))
+        var_eval.append(variables(0, xend[:len_rhs], xend[len_rhs:], p[:, k]))
 
     return casadi.horzcat(*var_eval)
 
 
-def _serial_step(model, solutions, inputs_dict, integrator, variables, t_eval, events):
+def _serial_step(
+    model,
+    solutions,
+    inputs,
+    integrator,
+    variables,
+    t_eval,
+    events,
+    dt,
+    timings=None,
+    stats=None,
+):
     """
     Internal function to process the model for one timestep in a serial way.
 
@@ -64,17 +85,28 @@ def _serial_step(model, solutions, inputs_dict, integrator, variables, t_eval, e
         solutions (iter of pybamm.Solution):
             Used to get the last state of the system and use as x0 and z0 for the
             casadi integrator. Provide solution objects for each battery.
-        inputs_dict (iter of input_dicts):
-            Provide inputs_dict objects for each battery.
+        inputs (np.ndarray):
+            The inputs of each battery in its column, with shape
+            [# inputs, # batteries] and the rows in the order of the
+            integrator parameters.
         integrator (casadi.integrator):
-            Produced by _create_casadi_objects when mapped = False
+            Produced by `liionpack.solvers.my_cco` when mapped = False
         variables (variables evaluator):
-            Produced by _create_casadi_objects when mapped = False
+            Produced by `liionpack.solvers.my_cco` when mapped = False
         t_eval (np.ndarray):
-            A float array of times to evaluate.
-            Produced by _create_casadi_objects when mapped = False
+            A float array of dimensionless times to evaluate, scaled by dt.
+            Produced by `liionpack.solvers.my_cco` when mapped = False
         events (mapped events evaluator):
-            Produced by `_create_casadi_objects`
+            Produced by `liionpack.solvers.my_cco`
+        dt (float):
+            The time interval (in seconds) to step forward.
+        timings (dict):
+            If given the time spent in the integrator and evaluating the
+            variables and events is added to the "integration" and
+            "evaluation" keys. Default is None.
+        stats (np.ndarray):
+            If given the integrator statistics of each battery are written to
+            the columns in the order of `_INTEGRATOR_STATS`. Default is None.
 
     Returns:
         sol (list):
@@ -85,25 +117,26 @@ def _serial_step(model, solutions, inputs_dict, integrator, variables, t_eval, e
     """
     len_rhs = model.concatenated_rhs.size
     N = len(solutions)
-    t_min = 0.0
     timer = pybamm.Timer()
+    # The step size is the final parameter of the integrator
+    ninputs = inputs.shape[0]
+    p = casadi.DM(np.vstack([inputs, np.full((1, N), dt)]))
     sol = []
     var_eval = []
     events_eval = []
     for k in range(N):
         if solutions[k] is None:
             # First pass
-            print("first pass triggered, serial step")
+            lp.logger.debug("First pass triggered, serial step")
             x0 = model.y0[:len_rhs]
             z0 = model.y0[len_rhs:]
         else:
             x0 = solutions[k].y[:len_rhs, -1]
             z0 = solutions[k].y[len_rhs:, -1]
-        temp = inputs_dict[k]
-        inputs = casadi.vertcat(*[x for x in temp.values()] + [t_min])
-        ninputs = len(temp.values())
         # Call the integrator once, with the grid
-        casadi_sol = integrator(x0=x0, z0=z0, p=inputs)
+        tic = ticker.perf_counter()
+        casadi_sol = integrator(x0=x0, z0=z0, p=p[:, k])
+        toc = ticker.perf_counter()
         xf = casadi.horzcat(x0, casadi_sol["xf"])
         zf = casadi_sol["zf"]
         if zf.is_empty():
@@ -111,19 +144,26 @@ def _serial_step(model, solutions, inputs_dict, integrator, variables, t_eval, e
         else:
             y_sol = casadi.vertcat(xf, zf)
         xend = y_sol[:, -1]
-        sol.append(pybamm.Solution(t_eval, y_sol, model, inputs_dict[k]))
-        var_eval.append(variables(0, xend[:len_rhs], xend[len_rhs:], inputs[0:ninputs]))
+        # The solutions only carry the states between steps
+        sol.append(pybamm.Solution(t_eval * dt, y_sol, model, {}))
+        p_k = p[:ninputs, k]
+        var_eval.append(variables(0, xend[:len_rhs], xend[len_rhs:], p_k))
         if events is not None:
-            events_eval.append(
-                events(0, xend[:len_rhs], xend[len_rhs:], inputs[0:ninputs])
-            )
+            events_eval.append(events(0, xend[:len_rhs], xend[len_rhs:], p_k))
+        if timings is not None:
+            timings["integration"] += toc - tic
+            timings["evaluation"] += ticker.perf_counter() - toc
+        if stats is not None:
+            integrator_stats = integrator.stats()
+            for i, key in enumerate(_INTEGRATOR_STATS):
+                stats[i, k] = integrator_stats[key]
         integration_time = timer.time()
         sol[-1].integration_time = integration_time
 
     return sol, casadi.horzcat(*var_eval), casadi.horzcat(*events_eval)
 
 
-def _mapped_eval(model, solutions, inputs_dict, variables, t_eval):
+def _mapped_eval(model, solutions, inputs, variables, t_eval):
     """
     Internal function to evaluate the model variables in a mapped way.
 
@@ -133,13 +173,15 @@ def _mapped_eval(model, solutions, inputs_dict, variables, t_eval):
         solutions (iter of pybamm.Solution):
             Used to get the last state of the system and use as x0 and z0 for the
             casadi integrator. Provide solution objects for each battery.
-        inputs_dict (iter of input_dicts):
-            Provide inputs_dict objects for each battery.
+        inputs (np.ndarray):
+            The inputs of each battery in its column, with shape
+            [# inputs, # batteries] and the rows in the order of the
+            integrator parameters.
         variables (mapped variables evaluator):
-            Produced by `_create_casadi_objects`
+            Produced by `liionpack.solvers.my_cco`
         t_eval (np.ndarray):
             A float array of times to evaluate.
-            Produced by _create_casadi_objects when mapped = False
+            Produced by `liionpack.solvers.my_cco` when mapped = False
 
     Returns:
         var_eval (list):
@@ -148,25 +190,31 @@ def _mapped_eval(model, solutions, inputs_dict, variables, t_eval):
     """
     len_rhs = model.concatenated_rhs.size
     N = len(solutions)
-    print("Mapped eval running with N=", N)
+    lp.logger.debug("Mapped eval of %d batteries", N)
     if solutions[0] is None:
         # First pass
-        print("First pass triggered, mapped eval")
+        lp.logger.debug("First pass triggered, mapped eval")
         xend = casadi.horzcat(*[model.y0[:len_rhs] for i in range(N)])
     else:
         xend = casadi.horzcat(*[sol.y[:len_rhs, -1] for sol in solutions])
-    t_min = 0.0
-    inputs = []
-    for temp in inputs_dict:
-        inputs.append(casadi.vertcat(*[x for x in temp.values()] + [t_min]))
-    ninputs = len(temp.values())
-    inputs = casadi.horzcat(*inputs)
-    var_eval = variables(0, xend[:len_rhs, :], xend[len_rhs:, :], inputs[0:ninputs, :])
+    p = casadi.DM(inputs)
+    var_eval = variables(0, xend[:len_rhs, :], xend[len_rhs:, :], p)
 
     return var_eval
 
 
-def _mapped_step(model, solutions, inputs_dict, integrator, variables, t_eval, events):
+def _mapped_step(
+    model,
+    solutions,
+    inputs,
+    integrator,
+    variables,
+    t_eval,
+    events,
+    dt,
+    timings=None,
+    stats=None,
+):
     """
     Internal function to process the model for one timestep in a mapped way.
     Mapped versions of the integrator and variables functions should already
@@ -178,17 +226,29 @@ def _mapped_step(model, solutions, inputs_dict, integrator, variables, t_eval, e
         solutions (iter of pybamm.Solution):
             Used to get the last state of the system and use as x0 and z0 for the
             casadi integrator. Provide solution objects for each battery.
-        inputs_dict (iter of input_dicts):
-            Provide inputs_dict objects for each battery.
+        inputs (np.ndarray):
+            The inputs of each battery in its column, with shape
+            [# inputs, # batteries] and the rows in the order of the
+            integrator parameters.
         integrator (mapped casadi.integrator):
-            Produced by `_create_casadi_objects`
+            Produced by `liionpack.solvers.my_cco`
         variables (mapped variables evaluator):
-            Produced by `_create_casadi_objects`
+            Produced by `liionpack.solvers.my_cco`
         t_eval (np.ndarray):
-            A float array of times to evaluate.
-            Produced by _create_casadi_objects when mapped = False
+            A float array of dimensionless times to evaluate, scaled by dt.
+            Produced by `liionpack.solvers.my_cco` when mapped = False
         events (mapped events evaluator):
-            Produced by `_create_casadi_objects`
+            Produced by `liionpack.solvers.my_cco`
+        dt (float):
+            The time interval (in seconds) to step forward.
+        timings (dict):
+            If given the time spent in the integrator and evaluating the
+            variables and events is added to the "integration" and
+            "evaluation" keys. Default is None.
+        stats (np.ndarray):
+            Not used as a mapped integrator does not report statistics for
+            each battery, actors that collect them are not mapped. Default is
+            None.
 
     Returns:
         sol (list):
@@ -201,26 +261,23 @@ def _mapped_step(model, solutions, inputs_dict, integrator, variables, t_eval, e
     N = len(solutions)
     if solutions[0] is None:
         # First pass
-        print("First pass triggered, mapped step")
+        lp.logger.debug("First pass triggered, mapped step")
         x0 = casadi.horzcat(*[model.y0[:len_rhs] for i in range(N)])
         z0 = casadi.horzcat(*[model.y0[len_rhs:] for i in range(N)])
     else:
         x0 = casadi.horzcat(*[sol.y[:len_rhs, -1] for sol in solutions])
         z0 = casadi.horzcat(*[sol.y[len_rhs:, -1] for sol in solutions])
-    # t_min = [0.0]*N
-    t_min = 0.0
-    inputs = []
-    for temp in inputs_dict:
-        inputs.append(casadi.vertcat(*[x for x in temp.values()] + [t_min]))
-    ninputs = len(temp.values())
-    inputs = casadi.horzcat(*inputs)
-    # p = casadi.horzcat(*zip(inputs, external_variables, [t_min]*N))
-    # inputs_with_tmin = casadi.vertcat(inputs, np.asarray(t_min))
+    # The step size is the final parameter of the integrator
+    ninputs = inputs.shape[0]
+    p = casadi.DM(np.vstack([inputs, np.full((1, N), dt)]))
     # Call the integrator once, with the grid
     timer = pybamm.Timer()
     tic = timer.time()
-    casadi_sol = integrator(x0=x0, z0=z0, p=inputs)
+    t_start = ticker.perf_counter()
+    casadi_sol = integrator(x0=x0, z0=z0, p=p)
     integration_time = timer.time()
+    if timings is not None:
+        timings["integration"] += ticker.perf_counter() - t_start
     nt = len(t_eval[1:])
     xf = casadi_sol["xf"]
     zf = casadi_sol["zf"]
@@ -237,140 +294,163 @@ def _mapped_step(model, solutions, inputs_dict, integrator, variables, t_eval, e
             y_sol = casadi.vertcat(y_diff, y_alg)
         xend.append(y_sol[:, -1])
         # Not sure how to index into zf - need an example
-        sol.append(pybamm.Solution(t_eval, y_sol, model, inputs_dict[i]))
+        sol.append(pybamm.Solution(t_eval * dt, y_sol, model, {}))
         sol[-1].integration_time = integration_time
     toc = timer.time()
-    lp.logger.debug(f"Mapped step completed in {toc - tic}")
+    lp.logger.debug("Mapped step completed in %s", toc - tic)
     xend = casadi.horzcat(*xend)
-    var_eval = variables(0, xend[:len_rhs, :], xend[len_rhs:, :], inputs[0:ninputs, :])
+    toc = ticker.perf_counter()
+    var_eval = variables(0, xend[:len_rhs, :], xend[len_rhs:, :], p[:ninputs, :])
     if events is not None:
-        events_eval = events(
-            0, xend[:len_rhs, :], xend[len_rhs:, :], inputs[0:ninputs, :]
-        )
+        events_eval = events(0, xend[:len_rhs, :], xend[len_rhs:, :], p[:ninputs, :])
+    if timings is not None:
+        timings["evaluation"] += ticker.perf_counter() - toc
     return sol, var_eval, events_eval
 
 
-def _create_casadi_objects(inputs, sim, dt, Nspm, nproc, variable_names, mapped):
+def _create_dt_integrator(model, solver, t_eval):
     """
-    Internal function to produce the casadi objects in their mapped form for
-    parallel evaluation
+    Internal function to create a casadi integrator with time scaled by the
+    step size. The step size is appended to the end of the input parameters
+    so that a single integrator can be used for any timestep.
+
+    Args:
+        model (pybamm.lithium_ion.BaseModel):
+            The built battery model, already set up by the solver.
+        solver (pybamm.CasadiSolver):
+            The solver used to set up the model, provides the tolerances and
+            integrator options.
+        t_eval (np.ndarray):
+            A float array of dimensionless times to evaluate between 0 and 1.
+
+    Returns:
+        integrator (casadi.integrator):
+            Integrator with parameters [inputs, dt] that returns the solution
+            at t_eval * dt.
+
+    """
+    rhs = model.casadi_rhs
+    algebraic = model.casadi_algebraic
+    options = {
+        "show_eval_warnings": False,
+        **solver.extra_options_setup,
+        "reltol": solver.rtol,
+        "abstol": solver.atol,
+    }
+    y0 = model.y0
+    t = casadi.MX.sym("t")
+    dt = casadi.MX.sym("dt")
+    p = casadi.MX.sym("p", rhs.size1_in(2))
+    y_diff = casadi.MX.sym("y_diff", rhs(0, y0, p).shape[0])
+    y_alg = casadi.MX.sym("y_alg", algebraic(0, y0, p).shape[0])
+    y_full = casadi.vertcat(y_diff, y_alg)
+    # Rescale time so that the integrator runs from 0 to 1 and the rhs is
+    # scaled by the step size
+    problem = {
+        "t": t,
+        "x": y_diff,
+        "ode": dt * rhs(dt * t, y_full, p),
+        "p": casadi.vertcat(p, dt),
+    }
+    if algebraic(0, y0, p).is_empty():
+        method = "cvodes"
+    else:
+        method = "idas"
+        problem.update({"z": y_alg, "alg": algebraic(dt * t, y_full, p)})
+    return casadi.integrator("F", method, problem, t_eval[0], t_eval[1:], options)
+
+
+def _resolve_map_options(Nspm, nproc, map_options=None):
+    """
+    Internal function to choose how the casadi functions are mapped over the
+    batteries.
 
     Args:
-        inputs (dict):
-            initial guess for inputs (not used for simulation).
-        sim (pybamm.Simulation):
-            A PyBaMM simulation object that contains the model, parameter values,
-            solver, solution etc.
-        dt (float):
-            The time interval (in seconds) for a single timestep. Fixed throughout
-            the simulation
         Nspm (int):
-            Number of individual batteries in the pack.
+            Number of batteries to map over.
         nproc (int):
-            Number of parallel processes to map to.
-        variable_names (list):
-            Variables to evaluate during solve. Must be a valid key in the
-            model.variables
-        mapped (bool):
-            Use the mapped casadi objects, default is True
+            Number of threads requested.
+        map_options (dict):
+            Options with keys "parallelization" (one of "auto", "serial",
+            "thread" or "openmp", default "auto"), "chunk_size" (the number of
+            batteries evaluated serially in each work unit, default None) and
+            "min_cells_per_thread" (used by "auto", default 8). "auto" uses at
+            most one thread per core and per "min_cells_per_thread" batteries,
+            a notice is logged when this is fewer threads than nproc.
 
     Returns:
-        integrator (mapped casadi.integrator):
-            Solves an initial value problem (IVP) coupled to a terminal value
-            problem with differential equation given as an implicit ODE coupled
-            to an algebraic equation and a set of quadratures
-        variables_fn (mapped variables evaluator):
-            evaluates the simulation and output variables. see casadi function
-        t_eval (np.ndarray):
-            Float array of times to evaluate.
-            times to evaluate in a single step, starting at zero for each step
-        events_fn (mapped events evaluator):
-            evaluates the event variables. see casadi function
+        parallelization (str):
+            The casadi map parallelization.
+        nthreads (int):
+            The number of threads.
+        chunk_size (int):
+            The number of batteries in each work unit, None for no chunking.
 
     """
-    solver = sim.solver
-    # Initial solution - this builds the model behind the scenes
-    sim.build()
-    initial_solutions = []
-    init_sol = sim.step(
-        dt=1e-6, save=False, starting_solution=None, inputs=inputs[0]
-    ).last_state
-    # evaluate initial condition
-    model = sim.built_model
-    y0_total_size = (
-        model.len_rhs + model.len_rhs_sens + model.len_alg + model.len_alg_sens
-    )
-    y_zero = np.zeros((y0_total_size, 1))
-    for inpt in inputs:
-        inputs_casadi = casadi.vertcat(*[x for x in inpt.values()])
-        initial_solutions.append(init_sol.copy())
-        _init = model.initial_conditions_eval(0, y_zero, inputs_casadi)
-        initial_solutions[-1].y[:] = _init
-
-    # Step model forward dt seconds
-    t_eval = np.linspace(0, dt, 11)
-
-    # No external variables - Temperature solved as lumped model in pybamm
-    # External variables could (and should) be used if battery thermal problem
-    # Includes conduction with any other circuits or neighboring batteries
-    # inp_and_ext.update(external_variables)
-    inp_and_ext = inputs
-
-    # Code to create mapped integrator
-    integrator = solver.create_integrator(
-        sim.built_model, inputs=inp_and_ext, t_eval=t_eval
-    )
-    if mapped:
-        integrator = integrator.map(Nspm, "thread", nproc)
-    # Get the input parameter order
-    ip_order = inputs[0].keys()
-    # Variables function for parallel evaluation
-    casadi_objs = sim.built_model.export_casadi_objects(
-        variable_names=variable_names, input_parameter_order=ip_order
-    )
-    variables = casadi_objs["variables"]
-    t, x, z, p = (
-        casadi_objs["t"],
-        casadi_objs["x"],
-        casadi_objs["z"],
-        casadi_objs["inputs"],
+    options = {"parallelization": "auto", "chunk_size": None, "min_cells_per_thread": 8}
+    if map_options is not None:
+        options.update(map_options)
+    parallelization = options["parallelization"]
+    nthreads = nproc
+    if parallelization == "auto":
+        # Threads have an overhead so only use as many as there are cores
+        # and enough batteries to keep busy
+        cores = os.cpu_count() or 1
+        nthreads = max(min(nproc, cores, Nspm // options["min_cells_per_thread"]), 1)
+        parallelization = "thread" if nthreads > 1 else "serial"
+        if nthreads < nproc:
+            lp.logger.notice(
+                "Auto mapping uses "
+                + str(nthreads)
+                + " of "
+                + str(nproc)
+                + " threads, at least "
+                + str(options["min_cells_per_thread"])
+                + " batteries per thread and one thread per core"
+            )
+    elif parallelization not in ["serial", "thread", "openmp"]:
+        raise ValueError("Unknown parallelization: " + str(parallelization))
+    return parallelization, max(nthreads, 1), options["chunk_size"]
+
+
+def _map_casadi_function(fn, Nspm, nproc, map_options=None):
+    """
+    Internal function to map a casadi function over the batteries.
+
+    Args:
+        fn (casadi.Function):
+            Function for a single battery.
+        Nspm (int):
+            Number of batteries to map over.
+        nproc (int):
+            Number of threads requested.
+        map_options (dict):
+            See `_resolve_map_options`.
+
+    Returns:
+        mapped (casadi.Function):
+            Function with a column for each battery.
+
+    """
+    parallelization, nthreads, chunk_size = _resolve_map_options(
+        Nspm, nproc, map_options
     )
-    variables_stacked = casadi.vertcat(*variables.values())
-    variables_fn = casadi.Function("variables", [t, x, z, p], [variables_stacked])
-    if mapped:
-        variables_fn = variables_fn.map(Nspm, "thread", nproc)
-
-    # Look for events in model variables and create a function to evaluate them
-    all_vars = sorted(sim.model.variables.keys())
-    event_vars = [v for v in all_vars if "Event" in v]
-    if len(event_vars) > 0:
-        # Variables function for parallel evaluation
-        casadi_objs = sim.built_model.export_casadi_objects(
-            variable_names=event_vars, input_parameter_order=ip_order
-        )
-        events = casadi_objs["variables"]
-        t, x, z, p = (
-            casadi_objs["t"],
-            casadi_objs["x"],
-            casadi_objs["z"],
-            casadi_objs["inputs"],
-        )
-        events_stacked = casadi.vertcat(*events.values())
-        events_fn = casadi.Function("variables", [t, x, z, p], [events_stacked])
-        if mapped:
-            events_fn = events_fn.map(Nspm, "thread", nproc)
-    else:
-        events_fn = None
-
-    output = {
-        "integrator": integrator,
-        "variables_fn": variables_fn,
-        "t_eval": t_eval,
-        "event_names": event_vars,
-        "events_fn": events_fn,
-        "initial_solutions": initial_solutions,
-    }
-    return output
+    if parallelization == "serial":
+        return fn.map(Nspm, "serial")
+    if chunk_size is not None and chunk_size > 1:
+        # Work units of batteries evaluated in serial, the chunk size has to
+        # divide the number of batteries
+        chunk = max(n for n in range(1, min(chunk_size, Nspm) + 1) if Nspm % n == 0)
+        if chunk != chunk_size:
+            # The number of batteries has no divisor close to the chunk size
+            if chunk > 1:
+                lp.logger.notice("Chunk size reduced to " + str(chunk))
+            else:
+                lp.logger.notice("Batteries are not chunked")
+        if chunk > 1:
+            fn = fn.map(chunk, "serial")
+            return fn.map(Nspm // chunk, parallelization, nthreads)
+    return fn.map(Nspm, parallelization, nthreads)
 
 
 def solve(
@@ -385,6 +465,23 @@ def solve(
     simlist=None,
     manager="casadi",
     node_termination_func=None,
+    adaptive=False,
+    adaptive_options=None,
+    rest_fast_forward=False,
+    rest_options=None,
+    implicit_coupling=False,
+    coupling_options=None,
+    persistent_actors=False,
+    load_balance=False,
+    load_balance_options=None,
+    map_options=None,
+    output_sink=None,
+    record_options=None,
+    checkpoint_options=None,
+    profile=False,
+    progress=True,
+    progress_interval=0.1,
+    integrator_stats=False,
 ):
     """
     Solves a pack simulation
@@ -399,25 +496,151 @@ def solve(
         parameter_values (pybamm.ParameterValues):
             A dictionary of all the model parameters
         experiment (pybamm.Experiment):
-            The experiment to be simulated. experiment.period is used to
-            determine the length of each timestep.
+            The experiment to be simulated. The period of each step is used
+            to determine the length of the timesteps within that step.
         inputs (dict):
             Dictionary for every model input with value for each battery
         initial_soc (float):
             The initial state of charge for every battery. The default is None
             in which case concentrations set in the parameter_values are used.
-        nproc (int):
+        nproc (int or tuple):
             Number of processes to start in parallel for mapping. The default is 1.
+            A tuple (K, T) runs K ray actors or worker processes that each
+            map over their batteries with T casadi threads. The casadi manager
+            uses K * T threads.
         output_variables (list):
             Variables to evaluate during solve. Must be a valid key in the
             model.variables
-        manager (string, can be - ["casadi", "ray"]):
+        manager (string, can be - ["casadi", "ray", "process"]):
             The solver manager to use for solving the electrochemical problem.
+            "process" runs nproc worker processes that share their inputs and
+            output through shared memory, the workers are spawned so sim_func
+            and parameter_values must be picklable.
+        node_termination_func (function):
+            A function of the node voltages that returns True when the
+            simulation should stop. The default is None.
+        adaptive (bool):
+            Adapt the time between circuit solves to the change in cell
+            currents and open circuit voltages. Steps are a whole number of
+            experiment periods, or a period divided into substeps that hold
+            the protocol value when the error is over tolerance. Output is
+            recorded on the variable time grid at the start of each period
+            and the substeps are not recorded. The default is False.
+        adaptive_options (dict):
+            Options for adaptive stepping with keys "dt_max" (the largest step
+            in seconds, default 10 periods of the current step), "current_rtol" (default 1e-2),
+            "current_atol" (A, default 1e-2), "voltage_tol" (V, default 1e-3),
+            "max_growth" (the largest factor the step can grow by,
+            default 2) and "max_substeps" (the most substeps a period is
+            divided into, default 8).
+        rest_fast_forward (bool):
+            Take large steps through rests once the rebalancing currents
+            between cells are small. The default is False.
+        rest_options (dict):
+            Options for fast forwarding rests with keys "current_threshold"
+            (the largest cell current in A to fast forward, default 1e-3),
+            "dt_max" (the largest step in seconds, default 600) and "resample"
+            (interpolate the output back onto the protocol time grid, default
+            True). Output is not resampled when adaptive is True.
+        implicit_coupling (bool):
+            Re-solve the circuit with the open circuit voltage and internal
+            resistance averaged over each step and repeat the step until the
+            battery currents converge. Allows longer periods for strongly
+            coupled packs at the cost of extra steps. The default is False.
+        coupling_options (dict):
+            Options for implicit coupling with keys "max_iterations" (the
+            largest number of times a step is taken, default 5) and
+            "current_tol" (A, default 1e-3).
+        persistent_actors (bool):
+            Only used by the ray manager. Attach to the running Ray session
+            and keep the actors with their built models alive after the solve
+            so that later solves with the same setup only reset the battery
+            states and inputs. Only the actors of the most recent setup are
+            kept and actors in use by another solve are never shared. Call
+            lp.RayManager.shutdown_pool() to release them. The default is
+            False.
+        load_balance (bool):
+            Only used by the ray manager. Periodically move batteries between
+            actors so that they take the same time to step, based on the
+            measured step time of each actor. The default is False.
+        load_balance_options (dict):
+            Options for load balancing with keys "interval" (the number of
+            steps between checks, default 20) and "threshold" (the ratio of
+            the slowest to the mean actor step time that triggers a
+            rebalance, default 1.2).
+        map_options (dict):
+            How the casadi functions are mapped over the batteries of each
+            actor when it uses more than one thread, with keys
+            "parallelization" ("auto", "serial", "thread" or "openmp",
+            default "auto"), "chunk_size" (the number of batteries evaluated
+            serially in each work unit, default None) and
+            "min_cells_per_thread" (the fewest batteries per thread chosen by
+            "auto", default 8). "auto" uses at most one thread per core and
+            logs a notice when it uses fewer threads than requested. A chunk
+            size is reduced to one that divides the number of batteries, with
+            a notice.
+        output_sink (str or liionpack.MemorySink):
+            Where the output is stored while stepping. The default is None
+            which keeps the output in memory. A directory or a
+            liionpack.MemmapSink streams the output to memory-mapped files
+            and the returned arrays are read lazily from disk.
+        record_options (dict):
+            Which steps, batteries and nodes are recorded, with keys "every"
+            (record every k-th step, not counting the substeps of adaptive
+            stepping, default 1), "cells" (indices of the
+            batteries to record, default None for all), "nodes" (indices of
+            the nodes to record, default None for all) and "trigger" (default
+            None). Empty lists for "cells" and "nodes" record only the pack
+            quantities. The battery indices of parallel group s of a pack
+            from setup_circuit are np.arange(Np) * Ns + s. The trigger is a
+            dict with keys "variable" (an output variable), "lower" and
+            "upper" (thresholds on the minimum and maximum of the variable
+            over the batteries) and "window" (default 10) and every step is
+            recorded once a threshold is crossed until "window" steps after
+            it is crossed back. With "summary" True (default False) the
+            histories of each battery are replaced by statistics over the
+            recorded batteries at each step, with keys such as
+            "Terminal voltage [V] min" for the "min", "max", "mean", "std",
+            "argmin", "argmax" and percentile statistics, e.g. "p95" for each
+            of the "percentiles" (default [5, 50, 95]). No node voltages are
+            recorded with a summary unless "nodes" are given.
+        checkpoint_options (dict):
+            Periodically write the state of the solve to a file so that it can
+            be continued with liionpack.resume if it is interrupted, with keys
+            "path" (the checkpoint file, default None for no checkpoints) and
+            "interval" (the number of steps between checkpoints, default
+            1000).
+        profile (bool):
+            Record the wall time of each phase of the solve, such as the
+            circuit solve and the integration. The default is False.
+        progress (bool or function):
+            Report the progress of the solve. True draws a progress bar,
+            False runs quietly without reporting or printing, and a function
+            is called as progress(step, nsteps, time) with the number of
+            protocol steps done, the total number of protocol steps and the
+            simulated time (s). The default is True.
+        progress_interval (float):
+            The least wall time in seconds between progress reports, the last
+            step is always reported. The default is 0.1.
+        integrator_stats (bool):
+            Collect the integrator steps, Newton iterations, error test
+            failures and Jacobian evaluations of each battery at each step,
+            returned with keys such as "Cell Newton iterations" [# steps,
+            # batteries] and the totals over the pack "Pack Newton
+            iterations" [# steps], which are also counters of the profiler.
+            A mapped casadi integrator does not report the statistics of the
+            batteries it steps, so with statistics each actor steps its
+            batteries in serial and casadi threads are not used. Run several
+            actors or worker processes to keep the pack parallel. The default
+            is False.
 
     Returns:
         output (dict):
             simulation output with keys including those specified in output
             variables, values are arrays of shape - [# steps, # batteries])
+        profiler (liionpack.Profiler):
+            Only returned when profile is True. The recorded phases which can
+            be summarised or exported as JSON and Chrome trace events.
 
     """
 
@@ -427,11 +650,16 @@ def solve(
     if manager == "casadi":
         rm = lp.CasadiManager()
     elif manager == "ray":
-        rm = lp.RayManager()
+        rm = lp.RayManager(
+            persistent=persistent_actors,
+            load_balance=load_balance,
+            load_balance_options=load_balance_options,
+        )
+    elif manager == "process":
+        rm = lp.ProcessPoolManager()
     else:
         rm = lp.CasadiManager()
         lp.logger.notice("manager instruction not supported, using default")
-    print("Hello I'm the modified liionpack") #KRJ - Added this so that I know the notebook is running the MODIFIED lp
     output = rm.solve(
         netlist=netlist,
         sim_func=sim_func,
@@ -444,5 +672,163 @@ def solve(
         simlist=simlist,
         setup_only=False,
         node_termination_func=node_termination_func,
+        adaptive=adaptive,
+        adaptive_options=adaptive_options,
+        rest_fast_forward=rest_fast_forward,
+        rest_options=rest_options,
+        implicit_coupling=implicit_coupling,
+        coupling_options=coupling_options,
+        map_options=map_options,
+        output_sink=output_sink,
+        record_options=record_options,
+        checkpoint_options=checkpoint_options,
+        profile=profile,
+        progress=progress,
+        progress_interval=progress_interval,
+        integrator_stats=integrator_stats,
     )
+    if profile:
+        return output, rm.profiler
     return output
+
+
+def resume(
+    checkpoint,
+    sim_func=None,
+    manager="casadi",
+    node_termination_func=None,
+    output_sink=None,
+):
+    """
+    Continues a solve from a checkpoint written by liionpack.solve with
+    checkpoint_options. The problem definition and the state of the pack are
+    read from the checkpoint and stepping continues from the last checkpoint,
+    which is updated as the solve carries on.
+
+    Args:
+        checkpoint (str):
+            Path of the checkpoint file.
+        sim_func (function):
+            The sim_func of the original solve. The default is None.
+        manager (string, can be - ["casadi", "ray", "process"]):
+            The solver manager to use. The default is "casadi".
+        node_termination_func (function):
+            The node_termination_func of the original solve. The default is
+            None.
+        output_sink (str or liionpack.MemorySink):
+            Where the output is stored while stepping. The default is None
+            which keeps the output in memory.
+
+    Returns:
+        output (dict):
+            simulation output of the whole solve with keys including those
+            specified in output variables, values are arrays of shape -
+            [# steps, # batteries])
+
+    """
+    if manager == "ray":
+        rm = lp.RayManager()
+    elif manager == "process":
+        rm = lp.ProcessPoolManager()
+    else:
+        rm = lp.CasadiManager()
+    return rm.resume(
+        checkpoint,
+        sim_func=sim_func,
+        node_termination_func=node_termination_func,
+        output_sink=output_sink,
+    )
+
+
+def solve_cycles(
+    netlist=None,
+    sim_func=None,
+    parameter_values=None,
+    experiment=None,
+    n_cycles=1,
+    inputs=None,
+    initial_soc=None,
+    nproc=1,
+    output_variables=None,
+    manager="casadi",
+    jump_options=None,
+):
+    """
+    Solves many repeats of a pack cycling experiment by simulating blocks of
+    cycles in full and extrapolating the cycle to cycle drift in the states of
+    each battery over the cycles in between
+
+    Args:
+        netlist (pandas.DataFrame):
+            A netlist of circuit elements with format. desc, node1, node2, value.
+            Produced by liionpack.read_netlist or liionpack.setup_circuit
+        sim_func (function):
+            A function containing model and solver definitions that accepts
+            parameter_values and returns a simulation.
+        parameter_values (pybamm.ParameterValues):
+            A dictionary of all the model parameters
+        experiment (pybamm.Experiment):
+            The experiment for a single cycle.
+        n_cycles (int):
+            The total number of cycles.
+        inputs (dict):
+            Dictionary for every model input with value for each battery
+        initial_soc (float):
+            The initial state of charge for every battery. The default is None
+            in which case concentrations set in the parameter_values are used.
+        nproc (int or tuple):
+            Number of processes to start in parallel for mapping. The default is 1.
+            A tuple (K, T) runs K ray actors or worker processes that each
+            map over their batteries with T casadi threads. The casadi manager
+            uses K * T threads.
+        output_variables (list):
+            Variables to evaluate during solve. Must be a valid key in the
+            model.variables
+        manager (string, can be - ["casadi", "ray", "process"]):
+            The solver manager to use for solving the electrochemical problem.
+            "process" runs nproc worker processes that share their inputs and
+            output through shared memory, the workers are spawned so sim_func
+            and parameter_values must be picklable.
+        jump_options (dict):
+            Options for cycle jumping with keys "full_cycles" (the number of
+            cycles simulated in full between jumps, at least 2, default 2),
+            "max_jump" (the largest number of cycles to skip, default 50),
+            "rtol" and "atol" (the tolerances on the extrapolation error of
+            each state, default 1e-3 and 1e-6) and "variables" (the model
+            variables whose states are extrapolated, default None which
+            extrapolates all differential states including the fast ones, so
+            pass the slow degradation variables such as
+            ["Negative total SEI thickness [m]"]).
+
+    Returns:
+        outputs (dict):
+            simulation output for each cycle simulated in full with the cycle
+            number as key, each value is an output dict as returned by solve.
+
+    """
+
+    if netlist is None or parameter_values is None or experiment is None:
+        raise Exception("Please supply a netlist, paramater_values, and experiment")
+
+    if manager == "casadi":
+        rm = lp.CasadiManager()
+    elif manager == "ray":
+        rm = lp.RayManager()
+    elif manager == "process":
+        rm = lp.ProcessPoolManager()
+    else:
+        rm = lp.CasadiManager()
+        lp.logger.notice("manager instruction not supported, using default")
+    rm.solve(
+        netlist=netlist,
+        sim_func=sim_func,
+        parameter_values=parameter_values,
+        experiment=experiment,
+        output_variables=output_variables,
+        inputs=inputs,
+        nproc=nproc,
+        initial_soc=initial_soc,
+        simlist=None,
+        setup_only=True,
+    )
+    return rm.solve_cycles(experiment, n_cycles, jump_options=jump_options)
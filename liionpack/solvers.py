@@ -8,15 +8,30 @@ from liionpack.solver_utils import _serial_step as ss
 from liionpack.solver_utils import _mapped_step as ms
 from liionpack.solver_utils import _serial_eval as se
 from liionpack.solver_utils import _mapped_eval as me
+from liionpack.solver_utils import _create_dt_integrator
+from liionpack.solver_utils import _map_casadi_function
+from liionpack.solver_utils import _INTEGRATOR_STATS
+from liionpack.solver_utils import _inputs_array
+from liionpack.profiler import _NULL_PROFILER
 import ray
 import numpy as np
+import os
+import pickle
 import time as ticker
+import multiprocessing
+from multiprocessing import shared_memory
+import threading
+import traceback
+from collections import OrderedDict
+from collections import deque
 from tqdm import tqdm
 import pybamm
 import casadi #KRJ - Need to import casadi here so cco can use it
 
 #KRJ - Added my_cco here
-def my_cco(inputs, sim, dt, Nspm, nproc, variable_names, mapped, simlist):
+def my_cco(
+    inputs, sim, dt, Nspm, nproc, variable_names, mapped, simlist, map_options=None
+):
     """
     Internal function to produce the casadi objects in their mapped form for
     parallel evaluation
@@ -28,8 +43,9 @@ def my_cco(inputs, sim, dt, Nspm, nproc, variable_names, mapped, simlist):
             A PyBaMM simulation object that contains the model, parameter values,
             solver, solution etc.
         dt (float):
-            The time interval (in seconds) for a single timestep. Fixed throughout
-            the simulation
+            The default time interval (in seconds) for a single timestep. The
+            integrator takes the step size as its final parameter so it can be
+            changed between steps.
         Nspm (int):
             Number of individual batteries in the pack.
         nproc (int):
@@ -39,6 +55,10 @@ def my_cco(inputs, sim, dt, Nspm, nproc, variable_names, mapped, simlist):
             model.variables
         mapped (bool):
             Use the mapped casadi objects, default is True
+        map_options (dict):
+            How the casadi objects are mapped, see
+            `liionpack.solver_utils._resolve_map_options`. The default is None
+            which chooses between serial and threads automatically.
 
     Returns:
         integrator (mapped casadi.integrator):
@@ -48,10 +68,13 @@ def my_cco(inputs, sim, dt, Nspm, nproc, variable_names, mapped, simlist):
         variables_fn (mapped variables evaluator):
             evaluates the simulation and output variables. see casadi function
         t_eval (np.ndarray):
-            Float array of times to evaluate.
-            times to evaluate in a single step, starting at zero for each step
+            Float array of dimensionless times to evaluate in a single step,
+            from zero to one and scaled by the step size
         events_fn (mapped events evaluator):
             evaluates the event variables. see casadi function
+        resistance (bool):
+            True if the variables evaluator has a final row with the internal
+            resistance -dV/dI of each battery
 
     """
     solver = sim.solver
@@ -73,21 +96,18 @@ def my_cco(inputs, sim, dt, Nspm, nproc, variable_names, mapped, simlist):
         _init = model.initial_conditions_eval(0, y_zero, inputs_casadi)
         initial_solutions[-1].y[:] = _init
 
-    # Step model forward dt seconds
-    t_eval = np.linspace(0, dt, 11)
+    # Step model forward dt seconds, time is scaled by dt which is supplied
+    # to the integrator as a parameter
+    t_eval = np.linspace(0, 1, 11)
 
     # No external variables - Temperature solved as lumped model in pybamm
     # External variables could (and should) be used if battery thermal problem
     # Includes conduction with any other circuits or neighboring batteries
-    # inp_and_ext.update(external_variables)
-    inp_and_ext = inputs
 
     # Code to create mapped integrator
-    integrator = solver.create_integrator(
-        sim.built_model, inputs=inp_and_ext, t_eval=t_eval
-    )
+    integrator = _create_dt_integrator(sim.built_model, solver, t_eval)
     if mapped:
-        integrator = integrator.map(Nspm, "thread", nproc)
+        integrator = _map_casadi_function(integrator, Nspm, nproc, map_options)
     # Get the input parameter order
     ip_order = inputs[0].keys()
     # Variables function for parallel evaluation
@@ -102,9 +122,22 @@ def my_cco(inputs, sim, dt, Nspm, nproc, variable_names, mapped, simlist):
         casadi_objs["inputs"],
     )
     variables_stacked = casadi.vertcat(*variables.values())
+    # Internal resistance as the sensitivity of the terminal voltage to the
+    # applied current, evaluated alongside the variables as the final row
+    resistance = "Current function [A]" in ip_order
+    if resistance:
+        V = variables[variable_names[0]]
+        dVdp = casadi.jacobian(V, p)
+        if z.shape[0] > 0:
+            # Algebraic states respond instantly to the current
+            g = casadi_objs["algebraic"]
+            dzdp = -casadi.solve(casadi.jacobian(g, z), casadi.jacobian(g, p))
+            dVdp = dVdp + casadi.mtimes(casadi.jacobian(V, z), dzdp)
+        i_current = list(ip_order).index("Current function [A]")
+        variables_stacked = casadi.vertcat(variables_stacked, -dVdp[i_current])
     variables_fn = casadi.Function("variables", [t, x, z, p], [variables_stacked])
     if mapped:
-        variables_fn = variables_fn.map(Nspm, "thread", nproc)
+        variables_fn = _map_casadi_function(variables_fn, Nspm, nproc, map_options)
 
     # Look for events in model variables and create a function to evaluate them
     all_vars = sorted(sim.model.variables.keys())
@@ -124,7 +157,7 @@ def my_cco(inputs, sim, dt, Nspm, nproc, variable_names, mapped, simlist):
         events_stacked = casadi.vertcat(*events.values())
         events_fn = casadi.Function("variables", [t, x, z, p], [events_stacked])
         if mapped:
-            events_fn = events_fn.map(Nspm, "thread", nproc)
+            events_fn = _map_casadi_function(events_fn, Nspm, nproc, map_options)
     else:
         events_fn = None
 
@@ -135,6 +168,7 @@ def my_cco(inputs, sim, dt, Nspm, nproc, variable_names, mapped, simlist):
         "event_names": event_vars,
         "events_fn": events_fn,
         "initial_solutions": initial_solutions,
+        "resistance": resistance,
     }
     return output
 
@@ -155,14 +189,24 @@ class GenericActor:
         initial_soc,
         nproc,
         simlist,
+        map_options=None,
+        integrator_stats=False,
     ):
-        print("Setup has started")
+        lp.logger.debug("Setup has started")
+        if integrator_stats and nproc > 1:
+            # A mapped casadi function reports no statistics and the
+            # integrator it maps is not updated by mapped calls, so the
+            # statistics of each battery are only available when they are
+            # stepped one at a time
+            lp.logger.notice("Integrator statistics step the batteries in serial")
+            nproc = 1
         # Casadi specific arguments
         if nproc > 1:
             mapped = True
         else:
             mapped = False
         self.Nspm = Nspm
+        self.dt = dt
         # Set up simulation
         self.parameter_values = parameter_values
         if initial_soc is not None:
@@ -187,7 +231,15 @@ class GenericActor:
         #KRJ added "lp." in front of my_cco so it points to the
         #editable lp.my_cco, and not the local function defined above.
         casadi_objs = lp.my_cco(
-            inputs, self.simulation, dt, Nspm, nproc, variable_names, mapped, simlist
+            inputs,
+            self.simulation,
+            dt,
+            Nspm,
+            nproc,
+            variable_names,
+            mapped,
+            simlist,
+            map_options=map_options,
         )
         self.model = self.simulation.built_model
         self.integrator = casadi_objs["integrator"]
@@ -196,8 +248,22 @@ class GenericActor:
         self.event_names = casadi_objs["event_names"]
         self.events_fn = casadi_objs["events_fn"]
         self.step_solutions = casadi_objs["initial_solutions"]
+        self.initial_solutions = self.step_solutions
+        self.resistance = casadi_objs.get("resistance", False)
+        self.Nrows = len(variable_names) + int(self.resistance)
         self.last_events = None
         self.event_change = None
+        self.set_step_functions(mapped)
+        self.set_integrator_stats(integrator_stats)
+
+    def set_integrator_stats(self, integrator_stats):
+        # The integrator statistics of each battery over the last step
+        self.integrator_stats = None
+        if integrator_stats:
+            self.integrator_stats = np.zeros([len(_INTEGRATOR_STATS), self.Nspm])
+
+    def set_step_functions(self, mapped):
+        self.mapped = mapped
         if mapped:
             self.step_fn = ms
             self.eval_fn = me
@@ -205,28 +271,128 @@ class GenericActor:
             self.step_fn = ss
             self.eval_fn = se
 
-    def step(self, inputs):
-        # Solver Step
+    def export_objects(self):
+        # The built model and serialized casadi functions of an actor set up
+        # for a single process, so other actors can skip building the model
+        if self.mapped:
+            raise ValueError("Only actors set up with nproc=1 can be exported")
+        events_fn = None
+        if self.events_fn is not None:
+            events_fn = self.events_fn.serialize()
+        return {
+            "model": self.model,
+            "integrator": self.integrator.serialize(),
+            "variables_fn": self.variables_fn.serialize(),
+            "events_fn": events_fn,
+            "t_eval": self.t_eval,
+            "event_names": self.event_names,
+            "resistance": self.resistance,
+            "Nrows": self.Nrows,
+        }
+
+    def setup_from_objects(
+        self, objects, Nspm, dt, inputs, nproc, map_options=None, integrator_stats=False
+    ):
+        # Set up from the output of export_objects and map the casadi
+        # functions over this actor's batteries, integrator statistics are
+        # only reported when the batteries are stepped in serial
+        mapped = nproc > 1 and not integrator_stats
+        if integrator_stats and nproc > 1:
+            lp.logger.notice("Integrator statistics step the batteries in serial")
+        self.Nspm = Nspm
+        self.dt = dt
+        self.model = objects["model"]
+        self.integrator = casadi.Function.deserialize(objects["integrator"])
+        self.variables_fn = casadi.Function.deserialize(objects["variables_fn"])
+        self.events_fn = None
+        if objects["events_fn"] is not None:
+            self.events_fn = casadi.Function.deserialize(objects["events_fn"])
+        if mapped:
+            self.integrator = _map_casadi_function(
+                self.integrator, Nspm, nproc, map_options
+            )
+            self.variables_fn = _map_casadi_function(
+                self.variables_fn, Nspm, nproc, map_options
+            )
+            if self.events_fn is not None:
+                self.events_fn = _map_casadi_function(
+                    self.events_fn, Nspm, nproc, map_options
+                )
+        self.t_eval = objects["t_eval"]
+        self.event_names = objects["event_names"]
+        self.resistance = objects["resistance"]
+        self.Nrows = objects["Nrows"]
+        self.set_step_functions(mapped)
+        self.set_integrator_stats(integrator_stats)
+        self.reset(inputs)
+
+    def reset(self, inputs):
+        # Return to the initial state with new inputs so that the actor and
+        # its built model can be reused for another solve
+        model = self.model
+        y_zero = np.zeros((model.len_rhs + model.len_alg, 1))
+        self.step_solutions = []
+        for inpt in inputs:
+            inputs_casadi = casadi.vertcat(*[x for x in inpt.values()])
+            y0 = model.initial_conditions_eval(0, y_zero, inputs_casadi)
+            self.step_solutions.append(
+                pybamm.Solution(np.array([0.0]), np.asarray(y0), model, inpt)
+            )
+        self.initial_solutions = self.step_solutions
+        self.last_events = None
+        self.event_change = None
+
+    def step(self, inputs, dt=None):
+        # Solver Step, the inputs are an array with a column for each battery
+        # or a list with an inputs dict for each battery
+        if dt is None:
+            dt = self.dt
+        if isinstance(inputs, list):
+            inputs = _inputs_array(inputs)
+        # Time spent in the integrator and evaluating variables this step
+        self.timings = {"integration": 0.0, "evaluation": 0.0}
         self.step_solutions, self.var_eval, self.events_eval = self.step_fn(
-            self.simulation.built_model,
+            self.model,
             self.step_solutions,
             inputs,
             self.integrator,
             self.variables_fn,
             self.t_eval,
             self.events_fn,
+            dt,
+            self.timings,
+            self.integrator_stats,
         )
         return self.check_events()
 
+    def step_with_output(self, inputs, dt=None):
+        # Step and return everything the manager needs after a step so that
+        # remote actors only need a single round trip
+        tic = ticker.time()
+        events = self.step(inputs, dt)
+        step_time = ticker.time() - tic
+        event_change = self.event_change if events else None
+        return (
+            np.asarray(self.output()),
+            events,
+            event_change,
+            step_time,
+            self.timings,
+            self.integrator_stats,
+        )
+
     def evaluate(self, inputs):
+        if isinstance(inputs, list):
+            inputs = _inputs_array(inputs)
         self.var_eval = self.eval_fn(
-            self.simulation.built_model,
+            self.model,
             self.step_solutions,
             inputs,
             self.variables_fn,
             self.t_eval,
         )
         lp.logger.notice("Evaluate function running")
+        return np.asarray(self.var_eval)
 
     def check_events(self):
         if self.last_events is not None:
@@ -246,6 +412,33 @@ class GenericActor:
     def get_event_names(self):
         return self.event_names
 
+    def store_state(self):
+        # Keep the state so that a step can be repeated
+        self.stored_state = (self.step_solutions, self.last_events)
+
+    def restore_state(self):
+        self.step_solutions, self.last_events = self.stored_state
+
+    def get_states(self):
+        # The state of each battery at the end of the last step
+        return np.hstack(
+            [np.asarray(sol.y[:, -1]).reshape(-1, 1) for sol in self.step_solutions]
+        )
+
+    def set_states(self, states):
+        # The events of the old states are not compared with the new ones
+        self.last_events = None
+        model = self.model
+        self.step_solutions = [
+            pybamm.Solution(
+                np.array([0.0]), states[:, k : k + 1], model, sol.all_inputs[0]
+            )
+            for k, sol in enumerate(self.step_solutions)
+        ]
+
+    def get_state_indices(self, variable_names):
+        return lp.get_state_indices(self.model, variable_names)
+
     def output(self):
         return self.var_eval
 
@@ -256,11 +449,186 @@ class RayActor(GenericActor):
         super().__init__(**kwargs)
 
 
+# Commands written to shared memory for the process pool workers, the
+# commands that reply or take a payload use the pipe of each worker
+_STOP, _STEP, _EVALUATE, _STORE, _RESTORE = 0, 1, 2, 3, 4
+_GET_STATES, _SET_STATES, _STATE_INDICES, _EVENT_CHANGE = 5, 6, 7, 8
+_REPLY_COMMANDS = [_GET_STATES, _STATE_INDICES, _EVENT_CHANGE]
+
+
+def _attach_buffers(buffers):
+    # Numpy arrays backed by the named shared memory blocks
+    blocks = {}
+    arrays = {}
+    for key, (name, shape) in buffers.items():
+        blocks[key] = shared_memory.SharedMemory(name=name)
+        arrays[key] = np.ndarray(shape, dtype=np.float64, buffer=blocks[key].buf)
+    return blocks, arrays
+
+
+def _pool_worker(index, conn, barrier, done, buffers, columns, setup_kwargs):
+    """
+    Run a GenericActor for a slice of the batteries in a worker process.
+
+    The worker waits at the barrier for the manager to write a command to
+    shared memory, reads its inputs from and writes its output to shared
+    memory, then releases the done semaphore. Errors, results and payloads
+    are sent on the pipe.
+
+    Args:
+        index (int):
+            Position of the worker in the pool.
+        conn (multiprocessing.connection.Connection):
+            Pipe to the manager.
+        barrier (multiprocessing.Barrier):
+            Shared by the workers and the manager to start each command.
+        done (multiprocessing.Semaphore):
+            Released by each worker when it finishes a command.
+        buffers (dict):
+            Name and shape of the shared memory blocks keyed by "control",
+            "inputs", "output", "stats" and "events".
+        columns (slice):
+            The batteries owned by the worker.
+        setup_kwargs (dict):
+            Arguments for GenericActor.setup.
+
+    """
+    blocks, arrays = _attach_buffers(buffers)
+    control = arrays["control"]
+    inputs = arrays["inputs"]
+    output = arrays["output"]
+    stats = arrays["stats"]
+    events = arrays["events"]
+    try:
+        actor = GenericActor()
+        actor.setup(**setup_kwargs)
+        ready = True
+        conn.send((None, (actor.get_event_names(), actor.Nrows)))
+    except Exception:
+        conn.send((traceback.format_exc(), None))
+        ready = False
+    while ready:
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            # The pool was aborted by the manager
+            break
+        command = int(control[0])
+        dt = control[1]
+        if command == _STOP:
+            break
+        error = None
+        result = None
+        try:
+            if command in [_STEP, _EVALUATE]:
+                step_inputs = inputs[:, columns]
+                if command == _STEP:
+                    events[index] = actor.step(step_inputs, dt)
+                    if actor.integrator_stats is not None:
+                        stats[:, columns] = actor.integrator_stats
+                else:
+                    actor.evaluate(step_inputs)
+                out = np.asarray(actor.output())
+                output[: out.shape[0], columns] = out
+            elif command == _STORE:
+                actor.store_state()
+            elif command == _RESTORE:
+                actor.restore_state()
+            elif command == _GET_STATES:
+                result = actor.get_states()
+            elif command == _SET_STATES:
+                actor.set_states(conn.recv())
+            elif command == _STATE_INDICES:
+                result = actor.get_state_indices(conn.recv())
+            elif command == _EVENT_CHANGE:
+                result = np.asarray(actor.get_event_change())
+        except Exception:
+            error = traceback.format_exc()
+        if command in _REPLY_COMMANDS or error is not None:
+            conn.send((error, result))
+        done.release()
+    del control, inputs, output, stats, events, arrays
+    for block in blocks.values():
+        block.close()
+    conn.close()
+
+
+# Output names of the integrator statistics in the order of _INTEGRATOR_STATS
+_INTEGRATOR_STAT_NAMES = [
+    "integrator steps",
+    "Newton iterations",
+    "error test failures",
+    "Jacobian evaluations",
+]
+
+
+class _ProgressBar:
+    # The default progress report, a single bar over the whole experiment
+    def __init__(self):
+        self.bar = None
+
+    def __call__(self, step, nsteps, time):
+        if self.bar is None:
+            self.bar = tqdm(total=nsteps, desc="Stepping simulation")
+        self.bar.update(step - self.bar.n)
+
+    def close(self):
+        if self.bar is not None:
+            self.bar.close()
+            self.bar = None
+
+
 class GenericManager:
     def __init__(
         self,
     ):
-        pass
+        self.observers = []
+
+    def add_observer(self, observer, every=None, interval=None):
+        """
+        Register a function that is called with the state of the pack while
+        stepping, for live monitoring and custom termination. Observers are
+        kept between solves.
+
+        Args:
+            observer (function):
+                Called as observer(view) where view is a dict with the same
+                keys as the view returned by `step`, holding read-only views
+                of the state of the pack at the start of the last step. Return
+                True to stop the solve after the step.
+            every (int):
+                The number of steps between calls. Default is None in which
+                case the observer is called every step unless an interval is
+                given.
+            interval (float):
+                The least wall time in seconds between calls. Default is None.
+                With every as well the observer is called when either is due.
+
+        Returns:
+            observer (function):
+                The observer, to pass to `remove_observer`.
+        """
+        if every is None and interval is None:
+            every = 1
+        self.observers.append(
+            {
+                "observer": observer,
+                "every": every,
+                "interval": interval,
+                "next_time": 0.0,
+            }
+        )
+        return observer
+
+    def remove_observer(self, observer):
+        """
+        Stop calling an observer registered with `add_observer`.
+
+        Args:
+            observer (function):
+                The observer to remove.
+        """
+        self.observers = [o for o in self.observers if o["observer"] is not observer]
 
     def solve(
         self,
@@ -275,11 +643,65 @@ class GenericManager:
         simlist,
         node_termination_func=None,
         setup_only=False,
+        adaptive=False,
+        adaptive_options=None,
+        rest_fast_forward=False,
+        rest_options=None,
+        implicit_coupling=False,
+        coupling_options=None,
+        map_options=None,
+        output_sink=None,
+        record_options=None,
+        checkpoint_options=None,
+        profile=False,
+        progress=True,
+        progress_interval=0.1,
+        integrator_stats=False,
     ):
+        # Record the wall time of each phase of the solve
+        self.profiler = lp.Profiler() if profile else _NULL_PROFILER
+        tic = self.profiler.start()
+        # Keep the problem definition so that checkpoints can be resumed
+        self.solve_options = {
+            "parameter_values": parameter_values,
+            "experiment": experiment,
+            "inputs": inputs,
+            "output_variables": output_variables,
+            "initial_soc": initial_soc,
+            "nproc": nproc,
+            "adaptive": adaptive,
+            "adaptive_options": adaptive_options,
+            "rest_fast_forward": rest_fast_forward,
+            "rest_options": rest_options,
+            "implicit_coupling": implicit_coupling,
+            "coupling_options": coupling_options,
+            "map_options": map_options,
+            "record_options": record_options,
+            "checkpoint_options": checkpoint_options,
+            "integrator_stats": integrator_stats,
+        }
         self.netlist = netlist
         self.sim_func = sim_func
         self.node_termination_func = node_termination_func
         self.parameter_values = parameter_values
+        self.adaptive = adaptive
+        self.rest_fast_forward = rest_fast_forward
+        self.implicit_coupling = implicit_coupling
+        self.map_options = map_options
+        self.integrator_stats = integrator_stats
+        # Progress is reported through a callback of the number of protocol
+        # steps done, the total and the time, which by default draws a bar
+        if progress is True:
+            progress = _ProgressBar()
+        elif progress is False:
+            progress = None
+        self.progress = progress
+        self.progress_interval = progress_interval
+        if output_sink is None:
+            output_sink = lp.MemorySink()
+        elif isinstance(output_sink, (str, os.PathLike)):
+            output_sink = lp.MemmapSink(output_sink)
+        self.output_sink = output_sink
         self.check_current_function()
         # Get netlist indices for resistors, voltage sources, current sources
         self.Ri_map = netlist["desc"].str.find("Ri") > -1
@@ -288,17 +710,67 @@ class GenericManager:
         self.Terminal_Node = np.array(netlist[self.I_map].node1)
         self.Nspm = np.sum(self.V_map)
 
+        # nproc can be a tuple of the number of actors and the number of
+        # casadi threads used by each actor
+        if isinstance(nproc, (tuple, list)):
+            nproc, self.nthreads = nproc
+        else:
+            self.nthreads = 1
         self.split_models(self.Nspm, nproc)
 
+        self.adaptive_options = {
+            "dt_max": None,
+            "current_rtol": 1e-2,
+            "current_atol": 1e-2,
+            "voltage_tol": 1e-3,
+            "max_growth": 2.0,
+            "max_substeps": 8,
+        }
+        if adaptive_options is not None:
+            self.adaptive_options.update(adaptive_options)
+        self.rest_options = {
+            "current_threshold": 1e-3,
+            "dt_max": 600.0,
+            "resample": True,
+        }
+        if rest_options is not None:
+            self.rest_options.update(rest_options)
+        self.coupling_options = {
+            "max_iterations": 5,
+            "current_tol": 1e-3,
+        }
+        if coupling_options is not None:
+            self.coupling_options.update(coupling_options)
+        self.record_options = {
+            "every": 1,
+            "cells": None,
+            "nodes": None,
+            "trigger": None,
+            "summary": False,
+            "percentiles": [5, 50, 95],
+        }
+        if record_options is not None:
+            self.record_options.update(record_options)
+        self.checkpoint_options = {
+            "path": None,
+            "interval": 1000,
+        }
+        if checkpoint_options is not None:
+            self.checkpoint_options.update(checkpoint_options)
+        self.checkpointing = self.checkpoint_options["path"] is not None
+        if self.checkpointing:
+            # Checkpoints store the problem, so check that it can be pickled
+            # before the solve rather than failing at the first checkpoint
+            try:
+                pickle.dumps((self.solve_options, netlist))
+            except Exception as e:
+                raise ValueError(
+                    "The problem can't be checkpointed as it can't be pickled, "
+                    "e.g. parameter values that are lambda functions: " + str(e)
+                ) from e
+
         # Generate the protocol from the supplied experiment
-        self.protocol_steps, self.terminations, self.step_types = (
-            lp.generate_protocol_from_experiment(experiment)
-        )
-        self.flattened_protocol = [
-            item for sublist in self.protocol_steps for item in sublist
-        ]
-        self.dt = experiment.period
-        self.Nsteps = len(self.flattened_protocol)
+        self._setup_protocol(experiment)
         # If the step is starting with a rest the current will be zero and
         # this messes up the internal resistance calc. Add a very small current
         # for init.
@@ -334,121 +806,694 @@ class GenericManager:
         self.Nvar = len(self.variable_names)
 
         # Storage variables for simulation data
-        self.shm_i_app = np.zeros([self.Nsteps, self.Nspm], dtype=np.float32)
-        self.shm_Ri = np.zeros([self.Nsteps, self.Nspm], dtype=np.float32)
-        self.output = np.zeros([self.Nvar, self.Nsteps, self.Nspm], dtype=np.float32)
-        self.node_voltages = np.zeros([self.Nsteps, len(V_node)], dtype=np.float32)
-
-        # Initialize currents in battery models
-        self.shm_i_app[0, :] = I_batt * -1
-
-        # Initialize the node voltages
-        self.node_voltages[0, :] = V_node
-
-        # Step forward in time
-        self.V_terminal = np.zeros(self.Nsteps, dtype=np.float32)
-        self.I_terminal = np.zeros(self.Nsteps, dtype=np.float32)
-        self.P_terminal = np.zeros(self.Nsteps, dtype=np.float32)
-        self.record_times = np.zeros(self.Nsteps, dtype=np.float32)
+        self.Nnodes = len(V_node)
+        self._setup_recording()
+        self._setup_storage()
+
+        # Initialize the state of the pack at the first step
+        self.cell_output = np.zeros([self.Nvar, self.Nspm], dtype=np.float32)
+        self.cell_current = np.zeros(self.Nspm, dtype=np.float32)
+        self.cell_current[:] = I_batt * -1
+        self.V_node = V_node
+        self.step_view = {}
+        self.observer_view = {}
+        self.cell_stats = None
+        if self.integrator_stats:
+            self.cell_stats = np.zeros([len(_INTEGRATOR_STATS), self.Nspm])
 
         self.v_cut_lower = parameter_values["Lower voltage cut-off [V]"]
         self.v_cut_higher = parameter_values["Upper voltage cut-off [V]"]
 
         # Handle the inputs
         self.inputs = inputs
-        self.inputs_dict = lp.build_inputs_dict(self.shm_i_app[0, :], self.inputs, None)
+        self.inputs_dict = lp.build_inputs_dict(self.cell_current, self.inputs, None)
+        # The actors take the inputs of each battery as a column of an array
+        # with the current in the first row, which is updated in place
+        self.input_array = _inputs_array(self.inputs_dict)
+        self.default_inputs = self.input_array[1:].copy()
         # Solver specific setup
+        self.actor_Ri = None
         self.setup_actors(nproc, self.inputs_dict, initial_soc, simlist)
         # Get the initial state of the system
         self.evaluate_actors()
+        self.last_value = None
+        self.resume_output = None
+        self.profiler.stop("setup", tic)
         if not setup_only:
-            self.global_step = 0
-            for ps, step_protocol in enumerate(self.protocol_steps):
-                step_termination = self.terminations[ps]
-                step_type = self.step_types[ps]
-                if step_termination == []:
-                    step_termination = 0.0
-                self._step_solve_step(step_protocol, step_termination, step_type, None)
+            self.run_protocol()
             return self.step_output()
+        # Checkpoints are only written by a complete solve
+        self.checkpointing = False
 
-    def _step_solve_step(self, protocol, termination, step_type, updated_inputs):
+    def _setup_protocol(self, experiment, include_initial_state=True):
+        # Generate the protocol from the supplied experiment
+        self.protocol_steps, self.terminations, self.step_types = (
+            lp.generate_protocol_from_experiment(experiment, include_initial_state)
+        )
+        self.flattened_protocol = [
+            item for sublist in self.protocol_steps for item in sublist
+        ]
+        # Each step of the experiment can have its own period, the integrator
+        # takes the step size as a parameter so no rebuild is needed
+        self.step_periods = [step.period for step in experiment.steps]
+        self.dt = self.step_periods[0]
+        self.step_dt = self.dt
+        self.macro_steps = 1
+        self.substeps = 1
+        self.substep = 0
+        # Times of each step of the protocol
+        step_dts = np.concatenate(
+            [
+                np.ones(len(proto)) * period
+                for proto, period in zip(self.protocol_steps, self.step_periods)
+            ]
+        )
+        self.protocol_times = np.concatenate([[0.0], np.cumsum(step_dts)[:-1]])
+        self.Nsteps = len(self.flattened_protocol)
+        self.protocol_offsets = np.cumsum(
+            [0] + [len(proto) for proto in self.protocol_steps]
+        )
+
+    def _setup_recording(self):
+        # Work out which cells, nodes and steps are recorded
+        opts = self.record_options
+        if opts["every"] < 1:
+            raise ValueError("record_options every must be at least 1")
+        if opts["cells"] is None:
+            self.recorded_cells = slice(None)
+            self.Nrecorded_cells = self.Nspm
+        else:
+            self.recorded_cells = np.asarray(opts["cells"], dtype=int)
+            self.Nrecorded_cells = len(self.recorded_cells)
+        if opts["nodes"] is None and opts["summary"]:
+            # Summaries keep the output independent of the size of the pack
+            self.recorded_nodes = np.array([], dtype=int)
+            self.Nrecorded_nodes = 0
+        elif opts["nodes"] is None:
+            self.recorded_nodes = slice(None)
+            self.Nrecorded_nodes = self.Nnodes
+        else:
+            self.recorded_nodes = np.asarray(opts["nodes"], dtype=int)
+            self.Nrecorded_nodes = len(self.recorded_nodes)
+        self.trigger = None
+        if opts["trigger"] is not None:
+            self.trigger = {"lower": None, "upper": None, "window": 10}
+            self.trigger.update(opts["trigger"])
+            variable = self.trigger["variable"]
+            if variable not in self.variable_names:
+                raise ValueError(
+                    "Trigger variable " + variable + " is not an output variable"
+                )
+            self.trigger["index"] = self.variable_names.index(variable)
+        # Statistics over the recorded cells replace the cell histories
+        self.summary_names = None
+        if opts["summary"]:
+            self.summary_names = [
+                "Cell current [A]",
+                "Cell internal resistance [Ohm]",
+            ] + self.variable_names
+            self.summary_cells = self.recorded_cells
+            self.Nrecorded_cells = 0
+            self.recorded_cells = slice(0, 0)
+            self.summary_stats = ["min", "max", "mean", "std"] + [
+                "p" + str(q) for q in opts["percentiles"]
+            ]
+        # Resampling is only needed when every step is recorded
+        self.full_recording = (
+            opts["every"] == 1 and self.trigger is None and not opts["summary"]
+        )
+
+    def _setup_storage(self):
+        # Storage variables for simulation data, only the recorded steps are
+        # stored. The number of steps recorded around events is unknown so
+        # space for every step is allocated, which is only committed to
+        # memory or disk when written
+        if self.trigger is None:
+            Nrecords = -(-self.Nsteps // self.record_options["every"])
+        else:
+            Nrecords = self.Nsteps
+        Ncells = self.Nrecorded_cells
+        sink = self.output_sink
+        self.shm_i_app = sink.allocate("cell_current", (Nrecords, Ncells))
+        self.shm_Ri = sink.allocate("cell_resistance", (Nrecords, Ncells))
+        self.output = sink.allocate("output", (self.Nvar, Nrecords, Ncells))
+        self.node_voltages = sink.allocate(
+            "node_voltages", (Nrecords, self.Nrecorded_nodes)
+        )
+        self.V_terminal = sink.allocate("pack_voltage", (Nrecords,))
+        self.I_terminal = sink.allocate("pack_current", (Nrecords,))
+        self.P_terminal = sink.allocate("pack_power", (Nrecords,))
+        self.record_times = sink.allocate("time", (Nrecords,))
+        if self.summary_names is not None:
+            Nq = len(self.summary_names)
+            self.summary = sink.allocate(
+                "summary", (Nq, len(self.summary_stats), Nrecords)
+            )
+            self.summary_index = sink.allocate(
+                "summary_index", (Nq, 2, Nrecords), dtype=np.int32
+            )
+        if self.integrator_stats:
+            Ns = len(_INTEGRATOR_STATS)
+            self.cell_stats_storage = sink.allocate(
+                "integrator_stats", (Ns, Nrecords, Ncells)
+            )
+            self.pack_stats = sink.allocate("pack_integrator_stats", (Ns, Nrecords))
+        self.record_index = 0
+        self.last_recorded_step = -1
+        self.storage_full = False
+        self.trigger_steps = 0
+        self.global_step = 0
+        # Steps taken not counting substeps, which decides the recorded steps
+        self.period_step = 0
+        self.time = 0.0
+        self.last_I_app = None
+        self.last_ocv = None
+        self.fast_forwarded = False
+
+    def run_protocol(self, start=(0, 0)):
+        """
+        Step through the experiment after a solve with setup_only=True. Call
+        `collect_output` for the output and `cleanup` when the actors are no
+        longer needed.
+
+        Args:
+            start (tuple):
+                The index of the experiment step and the position within it
+                to start from. Default is (0, 0), the start of the experiment.
+        """
+        self.next_progress = 0.0
+        self.stop_requested = False
+        for ps, step_protocol in enumerate(self.protocol_steps):
+            if ps < start[0] or self.stop_requested:
+                continue
+            self.protocol_index = ps
+            step_termination = self.terminations[ps]
+            step_type = self.step_types[ps]
+            if step_termination == []:
+                step_termination = 0.0
+            self.dt = self.step_periods[ps]
+            first = start[1] if ps == start[0] else 0
+            self._step_solve_step(
+                step_protocol, step_termination, step_type, None, first
+            )
+        if self.progress is not None:
+            offset = self.protocol_offsets[self.protocol_index]
+            self._report_progress(offset + self.step_index, force=True)
+            if hasattr(self.progress, "close"):
+                self.progress.close()
+
+    def _report_progress(self, step, force=False):
+        # Report at most once per interval so that progress costs one clock
+        # read per step however often the callback would otherwise run
+        now = ticker.perf_counter()
+        if now < self.next_progress and not force:
+            return
+        self.next_progress = now + self.progress_interval
+        self.progress(step, self.Nsteps, self.time)
+
+    def continue_protocol(self, experiment):
+        """
+        Run a new experiment starting from the current state of the batteries
+        and the pack, after `run_protocol` or a previous `continue_protocol`.
+        The output storage is replaced so call `collect_output` first to keep
+        the output of the last experiment.
+
+        Args:
+            experiment (pybamm.Experiment):
+                The experiment to run, its initial state is not recorded as
+                it is the final state of the last experiment.
+        """
+        self._setup_protocol(experiment, include_initial_state=False)
+        self._setup_storage()
+        self.run_protocol()
+
+    def _step_solve_step(
+        self, protocol, termination, step_type, updated_inputs, start=0
+    ):
         tic = ticker.time()
 
         # Do stepping
         lp.logger.notice("Starting step solve")
         vlims_ok = True
-        skip_vcheck = True
-        with tqdm(total=len(protocol), desc="Stepping simulation") as pbar:
-            step = 0
-            while step < len(protocol):
-                vlims_ok = self._step(
-                    step, protocol, termination, step_type, updated_inputs, skip_vcheck
-                )
-                skip_vcheck = False
-                if vlims_ok:
-                    # all good - keep going
-                    self.global_step += 1
-                    step += 1
-                    pbar.update(1)
-                else:
-                    # Move on to next protocol step
+        skip_vcheck = start == 0
+        self.run_lengths = self._protocol_run_lengths(protocol)
+        offset = self.protocol_offsets[self.protocol_index]
+        step = start
+        while step < len(protocol):
+            vlims_ok = self._step(
+                step, protocol, termination, step_type, updated_inputs, skip_vcheck
+            )
+            skip_vcheck = False
+            if vlims_ok:
+                # all good - keep going
+                self.global_step += 1
+                self.output_sink.step(self.global_step)
+                # Substeps of a refined step hold the protocol value until
+                # the whole period is covered
+                self.substep += 1
+                if self.substep == self.substeps:
+                    self.substep = 0
+                    self.period_step += 1
+                    step += self.macro_steps
+                interval = self.checkpoint_options["interval"]
+                if self.checkpointing and self.global_step % interval == 0:
+                    self.write_checkpoint(step)
+                if self.progress is not None:
+                    self._report_progress(offset + step)
+                if self.observers and self._notify_observers():
+                    lp.logger.notice("Solve stopped by an observer")
+                    self.stop_requested = True
                     break
-        self.step = step
+            else:
+                # Move on to next protocol step
+                self.substep = 0
+                break
+        self.step_index = step
         toc = ticker.time()
         lp.logger.notice("Step solve finished")
-        lp.logger.notice("Total stepping time " + str(np.around(toc - tic, 3)) + "s")
-        lp.logger.notice(
-            "Time per step " + str(np.around((toc - tic) / len(protocol), 3)) + "s"
-        )
+        lp.logger.notice("Total stepping time %.3fs", toc - tic)
+        lp.logger.notice("Time per step %.3fs", (toc - tic) / len(protocol))
 
     def step_output(self):
         self.cleanup()
-        self.shm_Ri = np.abs(self.shm_Ri)
-        # Collect outputs
-        report_steps = min(len(self.flattened_protocol), self.global_step)
+        return self.collect_output()
+
+    def _storage_arrays(self):
+        # The storage attributes and the axis of the steps in each
+        names = [
+            "shm_i_app",
+            "shm_Ri",
+            "node_voltages",
+            "V_terminal",
+            "I_terminal",
+            "P_terminal",
+            "record_times",
+        ]
+        arrays = [(name, 0) for name in names] + [("output", 1)]
+        if self.summary_names is not None:
+            arrays += [("summary", 2), ("summary_index", 2)]
+        if self.integrator_stats:
+            arrays += [("cell_stats_storage", 1), ("pack_stats", 1)]
+        return arrays
+
+    def write_checkpoint(self, step=None):
+        """
+        Write the state of the solve to the checkpoint file so that it can be
+        continued with `resume`. The file is replaced atomically so a
+        checkpoint is never left half written.
+
+        Args:
+            step (int):
+                The position in the current protocol step to resume from.
+                Default is None in which case the current position is used.
+        """
+        if step is None:
+            step = self.step_index
+        state = {
+            "global_step": self.global_step,
+            "period_step": self.period_step,
+            "time": self.time,
+            "protocol_position": (self.protocol_index, step),
+            "last_value": self.last_value,
+            "temp_Ri": self.temp_Ri,
+            "actor_Ri": self.actor_Ri,
+            "cell_output": self.cell_output,
+            "cell_current": self.cell_current,
+            "V_node": self.V_node,
+            "pack": (self.pack_current, self.pack_voltage, self.pack_power),
+            "input_array": self.input_array,
+            "last_I_app": self.last_I_app,
+            "last_ocv": self.last_ocv,
+            "step_dt": self.step_dt,
+            "substeps": self.substeps,
+            "substep": self.substep,
+            "fast_forwarded": self.fast_forwarded,
+            "record_index": self.record_index,
+            "last_recorded_step": self.last_recorded_step,
+            "storage_full": self.storage_full,
+            "trigger_steps": self.trigger_steps,
+        }
+        storage = {}
+        for name, axis in self._storage_arrays():
+            index = (slice(None),) * axis + (slice(0, self.record_index),)
+            storage[name] = np.array(getattr(self, name)[index])
+        checkpoint = {
+            "solve_options": self.solve_options,
+            "netlist": self.netlist,
+            "actor_states": self.get_actor_states(),
+            "actor_output": self.collect_actor_output(),
+            "state": state,
+            "storage": storage,
+        }
+        path = str(self.checkpoint_options["path"])
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+        lp.logger.notice("Checkpoint written at step " + str(self.global_step))
+
+    def resume(
+        self,
+        checkpoint,
+        sim_func=None,
+        simlist=None,
+        node_termination_func=None,
+        output_sink=None,
+    ):
+        """
+        Continue a solve from a checkpoint file. The actors are set up for the
+        problem stored in the checkpoint, the states of the batteries and the
+        pack are restored and stepping continues from the checkpointed step.
+
+        Args:
+            checkpoint (str):
+                Path of the checkpoint file written by a solve with
+                checkpoint_options.
+            sim_func (function):
+                The sim_func of the original solve, functions are not stored
+                in the checkpoint. Default is None.
+            simlist (list):
+                The simlist of the original solve. Default is None.
+            node_termination_func (function):
+                The node_termination_func of the original solve. Default is
+                None.
+            output_sink (str or liionpack.MemorySink):
+                Where the output is stored. Default is None for memory.
+
+        Returns:
+            output (dict):
+                The output of the whole solve, including the steps before the
+                checkpoint.
+        """
+        with open(checkpoint, "rb") as f:
+            checkpoint = pickle.load(f)
+        options = checkpoint["solve_options"]
+        self.solve(
+            netlist=checkpoint["netlist"],
+            sim_func=sim_func,
+            simlist=simlist,
+            node_termination_func=node_termination_func,
+            output_sink=output_sink,
+            setup_only=True,
+            **options,
+        )
+        self.checkpointing = self.checkpoint_options["path"] is not None
+        self.set_actor_states(checkpoint["actor_states"])
+        # The output of the last step is used to start the next step
+        self.resume_output = checkpoint["actor_output"]
+        state = checkpoint["state"]
+        start = state.pop("protocol_position")
+        self.pack_current, self.pack_voltage, self.pack_power = state.pop("pack")
+        self.input_array[:] = state.pop("input_array")
+        for name, value in state.items():
+            setattr(self, name, value)
+        for name, axis in self._storage_arrays():
+            index = (slice(None),) * axis + (slice(0, self.record_index),)
+            getattr(self, name)[index] = checkpoint["storage"][name]
+        lp.logger.notice("Resuming from step " + str(self.global_step))
+        self.run_protocol(start)
+        return self.step_output()
+
+    def collect_output(self):
+        """
+        Gather the output recorded by the last experiment without shutting
+        down the actors.
+
+        Returns:
+            output (dict):
+                The simulation output, as returned by `solve`.
+        """
+        self.output_sink.finalize()
+        # Collect outputs, a step that was recorded but not completed is
+        # dropped
+        report_steps = self.record_index
+        if self.last_recorded_step >= self.period_step:
+            report_steps -= 1
         self.all_output = {}
         self.all_output["Time [s]"] = self.record_times[:report_steps]
         self.all_output["Pack current [A]"] = self.I_terminal[:report_steps]
         self.all_output["Pack terminal voltage [V]"] = self.V_terminal[:report_steps]
         self.all_output["Pack power [W]"] = self.P_terminal[:report_steps]
-        self.all_output["Cell current [A]"] = self.shm_i_app[:report_steps, :]
         self.all_output["Node voltage [V]"] = self.node_voltages[:report_steps, :]
-        self.all_output["Cell internal resistance [Ohm]"] = self.shm_Ri[
-            :report_steps, :
-        ]
-        for j in range(self.Nvar):
-            self.all_output[self.variable_names[j]] = self.output[j, :report_steps, :]
+        if self.summary_names is None:
+            self.all_output["Cell current [A]"] = self.shm_i_app[:report_steps, :]
+            self.all_output["Cell internal resistance [Ohm]"] = self.shm_Ri[
+                :report_steps, :
+            ]
+            for j in range(self.Nvar):
+                self.all_output[self.variable_names[j]] = self.output[
+                    j, :report_steps, :
+                ]
+        else:
+            for i, name in enumerate(self.summary_names):
+                for j, stat in enumerate(self.summary_stats):
+                    key = name + " " + stat
+                    self.all_output[key] = self.summary[i, j, :report_steps]
+                for j, stat in enumerate(["argmin", "argmax"]):
+                    key = name + " " + stat
+                    self.all_output[key] = self.summary_index[i, j, :report_steps]
+        if self.integrator_stats:
+            for i, name in enumerate(_INTEGRATOR_STAT_NAMES):
+                self.all_output["Pack " + name] = self.pack_stats[i, :report_steps]
+                if self.summary_names is None:
+                    self.all_output["Cell " + name] = self.cell_stats_storage[
+                        i, :report_steps, :
+                    ]
+        if (
+            self.fast_forwarded
+            and self.rest_options["resample"]
+            and not self.adaptive
+            and self.full_recording
+        ):
+            self.all_output = self._resample_output(self.all_output, report_steps)
         return self.all_output
 
-    def _pack_voltage(self, step):
+    def solve_cycles(self, experiment, n_cycles, jump_options=None):
+        """
+        Simulate repeats of a cycle experiment from the state after a solve
+        with setup_only=True. Blocks of cycles are simulated in full and the
+        drift in the states of each battery from cycle to cycle is used to
+        extrapolate over the cycles in between, the size of each jump is
+        limited by the change in the drift so that the extrapolation error
+        stays within tolerance.
+
+        Args:
+            experiment (pybamm.Experiment):
+                A single cycle, the experiment given to solve.
+            n_cycles (int):
+                The number of cycles to simulate, including those skipped.
+            jump_options (dict):
+                Options for cycle jumping with keys "full_cycles" (the number
+                of cycles simulated in full between jumps, at least 2, default
+                2), "max_jump" (the largest number of cycles to skip, default
+                50), "rtol" and "atol" (the tolerances on the extrapolation
+                error of each state, default 1e-3 and 1e-6) and "variables"
+                (the model variables whose states are extrapolated). The
+                default "variables" of None extrapolates every differential
+                state, including fast states such as the particle
+                concentrations that do not drift smoothly from cycle to cycle,
+                so pass the slow degradation variables, e.g.
+                ["Negative total SEI thickness [m]"].
+
+        Returns:
+            outputs (dict):
+                The output of each cycle simulated in full, as returned by
+                `collect_output`, keyed by the cycle number starting from 1.
+        """
+        opts = {
+            "full_cycles": 2,
+            "max_jump": 50,
+            "rtol": 1e-3,
+            "atol": 1e-6,
+            "variables": None,
+        }
+        if jump_options is not None:
+            opts.update(jump_options)
+        if opts["full_cycles"] < 2:
+            raise ValueError("At least 2 full cycles are needed between jumps")
+        indices = self.get_actor_state_indices(opts["variables"])
+        outputs = {}
+        cycle = 0
+        while cycle < n_cycles:
+            # Simulate a block of cycles in full
+            start_states = [self.get_actor_states()]
+            for _ in range(min(opts["full_cycles"], n_cycles - cycle)):
+                if cycle == 0:
+                    self.run_protocol()
+                else:
+                    self.continue_protocol(experiment)
+                cycle += 1
+                outputs[cycle] = self.collect_output()
+                start_states.append(self.get_actor_states())
+            if cycle + opts["full_cycles"] >= n_cycles:
+                continue
+            # Extrapolate the slow states over the cycles to skip
+            states = start_states[-1]
+            drift = np.diff(np.asarray(start_states)[-3:, indices, :], axis=0)
+            change = np.abs(drift[1] - drift[0])
+            tol = opts["rtol"] * np.abs(states[indices]) + opts["atol"]
+            with np.errstate(divide="ignore"):
+                n_jump = np.min(np.sqrt(2 * tol / change))
+            n_jump = int(min(n_jump, opts["max_jump"]))
+            n_jump = min(n_jump, n_cycles - cycle - opts["full_cycles"])
+            if n_jump > 0:
+                states[indices] += n_jump * drift[1]
+                self.set_actor_states(states)
+                self.evaluate_actors()
+                cycle += n_jump
+                lp.logger.notice(
+                    "Jumped " + str(n_jump) + " cycles to cycle " + str(cycle)
+                )
+        self.cleanup()
+        return outputs
+
+    def step(self, value, inputs=None, dt=None, step_type="current"):
+        """
+        Take a single step of the pack after a solve with setup_only=True, for
+        co-simulation with external models that set the current or power and
+        the model inputs at every step.
+
+        The state of the pack is returned without copying it and the inputs
+        are copied straight into the input array that is passed to the actors,
+        in the same way as the cell currents in a solve.
+
+        Args:
+            value (float):
+                The pack current (A) or power (W) for the step.
+            inputs (np.ndarray):
+                Values of the model inputs for the step with shape
+                [# inputs, # batteries], the rows are in the order of the keys
+                of the inputs given to solve. The array is only read during the
+                call so it can be reused for the next step. Default is None in
+                which case the inputs given to solve are used.
+            dt (float):
+                The step size (s). Default is None in which case the period of
+                the first step of the experiment is used.
+            step_type (str):
+                "current" or "power". Default is "current".
+
+        Returns:
+            view (dict):
+                The state of the pack for the step with keys "Time [s]", the
+                pack quantities, "Cell current [A]", "Node voltage [V]" and the
+                output variables. The same dict is returned by every step and
+                the cell values are views of the state of the pack, which
+                hold the output at the start of the step and the currents over
+                the step, copy them to keep them. Steps are also recorded in
+                the output while there is space for the steps of the
+                experiment.
+        """
+        if dt is not None:
+            self.dt = dt
+        if inputs is not None and self.inputs is None:
+            raise ValueError("No model inputs were given to solve")
+        self.run_lengths = np.ones(1, dtype=int)
+        # A refined step is taken as substeps that together cover dt
+        while True:
+            self.vlims_ok = self._step(
+                0, [value], 0.0, step_type, inputs, self.global_step == 0
+            )
+            self.substep += 1
+            if self.substep == self.substeps or not self.vlims_ok:
+                break
+        self.substep = 0
+        view = self.step_view
+        if len(view) == 0:
+            view["Cell current [A]"] = self.cell_current
+            for j, name in enumerate(self.variable_names):
+                view[name] = self.cell_output[j, :]
+        self._update_view(view, self.V_node)
+        self.global_step += 1
+        self.period_step += 1
+        self.output_sink.step(self.global_step)
+        if self.observers and self._notify_observers():
+            self.vlims_ok = False
+        return view
+
+    def _update_view(self, view, V_node):
+        # The pack quantities of the last step, the cell values are views
+        # that are set when the view is created
+        view["Time [s]"] = self.time - self.step_dt
+        view["Pack current [A]"] = self.pack_current
+        view["Pack terminal voltage [V]"] = self.pack_voltage
+        view["Pack power [W]"] = self.pack_power
+        view["Node voltage [V]"] = V_node
+
+    def _notify_observers(self):
+        # Call the observers that are due with read-only views of the state
+        # of the pack and return True if any of them asks to stop
+        now = None
+        view = None
+        stop = False
+        for o in self.observers:
+            due = o["every"] is not None and self.global_step % o["every"] == 0
+            if o["interval"] is not None:
+                if now is None:
+                    now = ticker.perf_counter()
+                due = due or now >= o["next_time"]
+            if not due:
+                continue
+            if o["interval"] is not None:
+                o["next_time"] = now + o["interval"]
+            if view is None:
+                view = self._observer_view()
+            if o["observer"](view):
+                stop = True
+        return stop
+
+    def _observer_view(self):
+        def read_only(array):
+            array = array.view()
+            array.flags.writeable = False
+            return array
+
+        view = self.observer_view
+        if len(view) == 0:
+            view["Cell current [A]"] = read_only(self.cell_current)
+            for j, name in enumerate(self.variable_names):
+                view[name] = read_only(self.cell_output[j, :])
+        self._update_view(view, read_only(self.V_node))
+        return view
+
+    def _pack_voltage(self):
         current_nodes = self.netlist.loc[
             self.I_map, (["node2", "node1"])
         ].values.flatten()
-        return np.diff(self.node_voltages[step, current_nodes])[0]
+        return np.diff(self.V_node[current_nodes])[0]
 
     def _step(
         self, step, protocol, termination, step_type, updated_inputs, skip_vcheck
     ):
         vlims_ok = True
-        # 01 Calculate whether resting or restarting
-        self.resting = step > 0 and protocol[step] == 0.0 and protocol[step - 1] == 0.0
-        self.restarting = (
-            step > 0 and protocol[step] != 0.0 and protocol[step - 1] == 0.0
-        )
+        # 01 Calculate whether resting or restarting, the last value carries
+        # over between protocol steps
+        if step > 0:
+            last_value = protocol[step - 1]
+        else:
+            last_value = self.last_value
+        self.resting = last_value == 0.0 and protocol[step] == 0.0
+        self.restarting = last_value == 0.0 and protocol[step] != 0.0
+        self.last_value = protocol[step]
         # 02 Get the actor output - Battery state info
-        self.get_actor_output(self.global_step)
+        tic = self.profiler.start()
+        self.get_actor_output()
+        self.profiler.stop("output copy", tic)
         # 03 Get the ocv and internal resistance
-        temp_v = self.output[0, self.global_step, :]
-        temp_ocv = self.output[1, self.global_step, :]
-        # When resting and rebalancing currents are small the internal
-        # resistance calculation can diverge as it's R = V / I
-        # At rest the internal resistance should not change greatly
-        # so for now just don't recalculate it.
-        if not self.resting and not self.restarting:
-            self.temp_Ri = self.calculate_internal_resistance(self.global_step)
-        self.shm_Ri[self.global_step, :] = self.temp_Ri
+        temp_v = self.cell_output[0, :]
+        temp_ocv = self.cell_output[1, :]
+        if self.actor_Ri is not None:
+            # Linearise each battery about its state, V = E - Ri * I
+            self.temp_Ri = self.actor_Ri
+            temp_E = temp_v + self.temp_Ri * self.cell_current
+        else:
+            # When resting and rebalancing currents are small the internal
+            # resistance calculation can diverge as it's R = V / I
+            # At rest the internal resistance should not change greatly
+            # so for now just don't recalculate it.
+            if not self.resting and not self.restarting:
+                self.temp_Ri = self.calculate_internal_resistance()
+            temp_E = temp_ocv
         # 04 Update netlist
-        self.netlist.loc[self.V_map, ("value")] = temp_ocv
+        self.netlist.loc[self.V_map, ("value")] = temp_E
         self.netlist.loc[self.Ri_map, ("value")] = self.temp_Ri
 
         # 05 Solve the circuit with updated netlist
@@ -460,22 +1505,26 @@ class GenericManager:
                 current = protocol[step]
                 power = None
             V_node, I_batt, terminal_current, terminal_voltage, terminal_power = (
-                lp.solve_circuit(self.netlist, current=current, power=power)
+                lp.solve_circuit(
+                    self.netlist, current=current, power=power, profiler=self.profiler
+                )
             )
+            tic = self.profiler.start()
             lp.power_loss(self.netlist)
-            self.record_times[self.global_step] = self.global_step * self.dt
+            self.profiler.stop("power loss", tic)
             self.netlist.loc[self.I_map, ("value")] = terminal_current
-            self.I_terminal[self.global_step] = terminal_current[0]
-            self.V_terminal[self.global_step] = terminal_voltage[0]
-            self.P_terminal[self.global_step] = terminal_power[0]
-        if self.global_step < self.Nsteps - 1:
-            # igore last step save the new currents and build inputs
-            # for the next step
-            I_app = I_batt[:] * -1
-            self.shm_i_app[self.global_step, :] = I_app
-            self.shm_i_app[self.global_step + 1, :] = I_app
-            self.node_voltages[self.global_step, :] = V_node
-            self.inputs_dict = lp.build_inputs_dict(I_app, self.inputs, updated_inputs)
+            self._set_pack_state(
+                V_node, terminal_current, terminal_voltage, terminal_power
+            )
+        # Save the new currents and build inputs for the step, the state of
+        # the pack carries over so this is also done on the last step
+        I_app = I_batt[:] * -1
+        self.cell_current[:] = I_app
+        self.input_array[0] = I_app
+        if updated_inputs is None:
+            self.input_array[1:] = self.default_inputs
+        else:
+            self.input_array[1:] = updated_inputs
         # 06 Check if voltage limits are reached and terminate
         if np.any(temp_v < self.v_cut_lower):
             lp.logger.warning("Low voltage limit reached")
@@ -494,9 +1543,216 @@ class GenericManager:
         if skip_vcheck:
             vlims_ok = True
         # 07 Step the electrochemical system
+        self.macro_steps = self._macro_steps(step, I_batt * -1, temp_ocv)
+        self.step_dt = self.macro_steps * self.dt / self.substeps
+        if self.implicit_coupling:
+            self.store_actor_states()
+        if self.cell_stats is not None:
+            # Repeated steps add to the statistics of the step
+            self.cell_stats[:] = 0.0
         self.step_actors()
+        # 08 Iterate the circuit and electrochemical solve until the current
+        # split between the batteries converges
+        if self.implicit_coupling and (self.actor_Ri is not None or not self.resting):
+            self._iterate_coupling(current, power, temp_E, I_app)
+        if self.cell_stats is not None:
+            # Integrator statistics of the whole pack for the step
+            self.step_stats = self.cell_stats.sum(axis=1)
+            for name, value in zip(_INTEGRATOR_STAT_NAMES, self.step_stats):
+                self.profiler.count(name, value)
+        # 09 Record the state of the pack at the start of the step
+        tic = self.profiler.start()
+        self._record_step()
+        self.profiler.stop("output copy", tic)
+        self.time += self.step_dt
+        self.balance_actors()
         return vlims_ok
 
+    def _iterate_coupling(self, current, power, E_start, I_app):
+        # Re-solve the circuit using the average of the source voltage
+        # and internal resistance at the start and end of the step and repeat
+        # the step with the new currents until they stop changing
+        Ri_start = self.temp_Ri
+        for _ in range(self.coupling_options["max_iterations"] - 1):
+            out = self.collect_actor_output()
+            v_end = out[0, :]
+            if out.shape[0] > self.Nvar:
+                Ri_end = self._actor_resistance(out)
+                E_end = v_end + Ri_end * I_app
+            else:
+                E_end = out[1, :]
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    Ri_end = np.abs((E_end - v_end) / I_app)
+                Ri_end = np.where(np.isfinite(Ri_end) & (Ri_end > 0), Ri_end, Ri_start)
+            self.netlist.loc[self.V_map, ("value")] = 0.5 * (E_start + E_end)
+            self.netlist.loc[self.Ri_map, ("value")] = 0.5 * (Ri_start + Ri_end)
+            V_node, I_batt, terminal_current, terminal_voltage, terminal_power = (
+                lp.solve_circuit(
+                    self.netlist, current=current, power=power, profiler=self.profiler
+                )
+            )
+            I_new = I_batt * -1
+            if np.max(np.abs(I_new - I_app)) < self.coupling_options["current_tol"]:
+                break
+            # Repeat the step with the corrected currents
+            I_app = I_new
+            self.restore_actor_states()
+            self.input_array[0] = I_app
+            self.step_actors()
+            self.netlist.loc[self.I_map, ("value")] = terminal_current
+            self.cell_current[:] = I_app
+            self._set_pack_state(
+                V_node, terminal_current, terminal_voltage, terminal_power
+            )
+
+    def _set_pack_state(self, V_node, terminal_current, terminal_voltage, power):
+        self.V_node = V_node
+        self.pack_current = terminal_current[0]
+        self.pack_voltage = terminal_voltage[0]
+        self.pack_power = power[0]
+
+    def _record_step(self):
+        # Copy the state of the pack to storage if the step is recorded. A
+        # step that is repeated after a termination overwrites its record and
+        # only the first substep of a refined step is recorded
+        if self.substep > 0:
+            return
+        if self.period_step == self.last_recorded_step:
+            r = self.record_index - 1
+        else:
+            record = self.period_step % self.record_options["every"] == 0
+            if self.trigger is not None:
+                values = self.cell_output[self.trigger["index"], :]
+                lower = self.trigger["lower"]
+                upper = self.trigger["upper"]
+                if (lower is not None and values.min() < lower) or (
+                    upper is not None and values.max() > upper
+                ):
+                    self.trigger_steps = self.trigger["window"] + 1
+                if self.trigger_steps > 0:
+                    self.trigger_steps -= 1
+                    record = True
+            if not record:
+                return
+            r = self.record_index
+            if r == len(self.record_times):
+                # External stepping can go past the steps of the experiment
+                if not self.storage_full:
+                    lp.logger.warning("Output storage is full, steps not recorded")
+                    self.storage_full = True
+                return
+            self.record_index += 1
+            self.last_recorded_step = self.period_step
+        cells = self.recorded_cells
+        self.record_times[r] = self.time
+        self.I_terminal[r] = self.pack_current
+        self.V_terminal[r] = self.pack_voltage
+        self.P_terminal[r] = self.pack_power
+        self.node_voltages[r, :] = self.V_node[self.recorded_nodes]
+        self.shm_i_app[r, :] = self.cell_current[cells]
+        self.shm_Ri[r, :] = self.temp_Ri[cells]
+        self.output[:, r, :] = self.cell_output[:, cells]
+        if self.summary_names is not None:
+            self._record_summary(r)
+        if self.cell_stats is not None:
+            self.cell_stats_storage[:, r, :] = self.cell_stats[:, cells]
+            self.pack_stats[:, r] = self.step_stats
+
+    def _record_summary(self, r):
+        # Distribution of each cell quantity over the recorded cells
+        cells = self.summary_cells
+        values = np.vstack(
+            [
+                self.cell_current[cells],
+                self.temp_Ri[cells],
+                self.cell_output[:, cells],
+            ]
+        )
+        stats = self.summary[:, :, r]
+        stats[:, 0] = values.min(axis=1)
+        stats[:, 1] = values.max(axis=1)
+        stats[:, 2] = values.mean(axis=1)
+        stats[:, 3] = values.std(axis=1)
+        percentiles = self.record_options["percentiles"]
+        if len(percentiles) > 0:
+            stats[:, 4:] = np.percentile(values, percentiles, axis=1).T
+        index = np.vstack([values.argmin(axis=1), values.argmax(axis=1)]).T
+        if not isinstance(cells, slice):
+            index = cells[index]
+        self.summary_index[:, :, r] = index
+
+    def _protocol_run_lengths(self, protocol):
+        # Number of consecutive steps from each step with the same value
+        run_lengths = np.ones(len(protocol), dtype=int)
+        for i in range(len(protocol) - 2, -1, -1):
+            if protocol[i] == protocol[i + 1]:
+                run_lengths[i] = run_lengths[i + 1] + 1
+        return run_lengths
+
+    def _macro_steps(self, step, I_app, ocv):
+        # Number of protocol steps to cover with the next integration
+        if self.rest_fast_forward and self.resting:
+            # Fast forward through rests once the rebalancing currents are small
+            opts = self.rest_options
+            if np.max(np.abs(I_app)) < opts["current_threshold"]:
+                self.last_I_app = I_app.copy()
+                self.last_ocv = ocv.copy()
+                self.fast_forwarded = True
+                self.substeps = 1
+                n_max = min(self.run_lengths[step] - 1, opts["dt_max"] // self.dt)
+                return int(max(n_max, 1))
+        if not self.adaptive:
+            return 1
+        opts = self.adaptive_options
+        if self.substep > 0:
+            # The number of substeps is fixed for the whole period
+            self.last_I_app = I_app.copy()
+            self.last_ocv = ocv.copy()
+            return 1
+        if self.last_I_app is None:
+            dt_next = self.dt
+        else:
+            # Estimate the error from the change in the cell currents and
+            # open circuit voltages over the last step relative to the tolerances
+            I_tol = opts["current_atol"] + opts["current_rtol"] * np.max(
+                np.abs(self.last_I_app)
+            )
+            I_err = np.max(np.abs(I_app - self.last_I_app)) / I_tol
+            V_err = np.max(np.abs(ocv - self.last_ocv)) / opts["voltage_tol"]
+            err = max(I_err, V_err)
+            if err > 0.0:
+                factor = min(opts["max_growth"], 1.0 / err)
+            else:
+                factor = opts["max_growth"]
+            dt_next = self.step_dt * factor
+        self.last_I_app = I_app.copy()
+        self.last_ocv = ocv.copy()
+        if dt_next < self.dt:
+            # Refine the period into substeps that hold the protocol value
+            n_sub = np.ceil(self.dt / max(dt_next, 1e-12))
+            self.substeps = int(min(n_sub, opts["max_substeps"]))
+            return 1
+        self.substeps = 1
+        # The step can't extend past a change in the protocol value and the
+        # last step before a change is always taken on its own so it is recorded
+        dt_max = opts["dt_max"]
+        if dt_max is None:
+            dt_max = 10 * self.dt
+        n_max = min(self.run_lengths[step] - 1, dt_max // self.dt)
+        return int(np.clip(np.floor(dt_next / self.dt), 1, max(n_max, 1)))
+
+    def _resample_output(self, output, report_steps):
+        # Interpolate the output recorded on a coarse grid back onto the
+        # protocol time grid
+        time = self.record_times[:report_steps].astype(float)
+        t_end = time[-1] + 0.5 * min(self.step_periods)
+        protocol_time = self.protocol_times[self.protocol_times <= t_end]
+        resampled = {"Time [s]": protocol_time.astype(np.float32)}
+        for key, value in output.items():
+            if key != "Time [s]":
+                resampled[key] = lp.resample(protocol_time, time, value)
+        return resampled
+
     def check_current_function(self):
         i_func = self.parameter_values["Current function [A]"]
         if i_func.__class__ is not pybamm.InputParameter:
@@ -507,7 +1763,7 @@ class GenericManager:
 
     def actor_i_app(self, index):
         actor_indices = self.split_index[index]
-        return self.shm_i_app[self.timestep, actor_indices]
+        return self.cell_current[actor_indices]
 
     def actor_htc(self, index):
         return self.htc[index]
@@ -516,14 +1772,14 @@ class GenericManager:
         inputs = []
         #print("Number of actors at build_inputs:",len(self.actors))
         for i in range(len(self.actors)):
-            inputs.append(self.inputs_dict[self.slices[i]])
+            inputs.append(self.input_array[:, self.slices[i]])
         return inputs
 
-    def calculate_internal_resistance(self, step):
+    def calculate_internal_resistance(self):
         # Calculate internal resistance and update netlist
-        temp_v = self.output[0, step, :]
-        temp_ocv = self.output[1, step, :]
-        temp_I = self.shm_i_app[step, :]
+        temp_v = self.cell_output[0, :]
+        temp_ocv = self.cell_output[1, :]
+        temp_I = self.cell_current
         temp_Ri = np.abs((temp_ocv - temp_v) / temp_I)
         temp_Ri[temp_Ri == 0.0] = 1e-6
         return temp_Ri
@@ -535,80 +1791,323 @@ class GenericManager:
         pass
 
     def split_models(self, Nspm, nproc):
-        pass
+        # Manage the number of SPM models per worker
+        self.split_index = np.array_split(np.arange(Nspm), nproc)
+        self.spm_per_worker = [len(s) for s in self.split_index]
+        self.slices = []
+        for i in range(nproc):
+            self.slices.append(
+                slice(self.split_index[i][0], self.split_index[i][-1] + 1)
+            )
 
     def setup_actors(self, nproc, inputs, initial_soc, simlist):
         pass
 
+    def log_event(self, event_change):
+        # Warn about the events that changed for each battery in the step
+        event_change = np.asarray(event_change)
+        for r in range(event_change.shape[0]):
+            if np.any(event_change[r, :]):
+                lp.logger.warning(
+                    self.event_names[r]
+                    + ", Batteries: "
+                    + str(np.where(event_change[r, :])[0].tolist())
+                )
+
+    def balance_actors(self):
+        pass
+
     def step_actors(self):
         pass
 
     def evaluate_actors(self):
         pass
 
-    def get_actor_output(self, step):
+    def get_actor_output(self):
+        if self.resume_output is not None:
+            out = self.resume_output
+            self.resume_output = None
+        else:
+            out = self.collect_actor_output()
+        self.cell_output[:] = out[: self.Nvar, :]
+        if out.shape[0] > self.Nvar:
+            self.actor_Ri = self._actor_resistance(out)
+
+    def _actor_resistance(self, out):
+        # Internal resistance from the final row of the actor output
+        Ri = out[self.Nvar, :].copy()
+        Ri[Ri <= 0.0] = 1e-6
+        return Ri
+
+    def collect_actor_output(self):
+        pass
+
+    def store_actor_states(self):
+        pass
+
+    def restore_actor_states(self):
+        pass
+
+    def get_actor_states(self):
+        pass
+
+    def set_actor_states(self, states):
+        pass
+
+    def get_actor_state_indices(self, variable_names):
         pass
 
     def cleanup(self):
         pass
 
 
+class _RayActorPool:
+    """
+    Warm Ray actors kept alive between solves by persistent managers, keyed
+    by their setup. An entry is checked out while a manager uses it so that
+    its actors are never shared, and only the most recently used idle
+    entries are kept, the actors of older ones are killed. The pool keeps the
+    Ray session of a manager that started it alive, so it records whether it
+    has to shut Ray down.
+    """
+
+    def __init__(self, max_entries=1):
+        self.actors = OrderedDict()
+        self.checked_out = set()
+        self.max_entries = max_entries
+        self.owns_ray = False
+
+    def checkout(self, key):
+        # Idle actors with the same setup, None if there are none
+        if key not in self.actors or key in self.checked_out:
+            return None
+        self.checked_out.add(key)
+        self.actors.move_to_end(key)
+        return self.actors[key]
+
+    def add(self, key, entry):
+        # New actors are added checked out, returns False if the key is
+        # already held by another manager
+        if key in self.actors:
+            return False
+        self.actors[key] = entry
+        self.checked_out.add(key)
+        self._evict()
+        return True
+
+    def release(self, key):
+        self.checked_out.discard(key)
+        self._evict()
+
+    def _evict(self):
+        idle = [key for key in self.actors if key not in self.checked_out]
+        while len(self.actors) > self.max_entries and len(idle) > 0:
+            actors, _, _ = self.actors.pop(idle.pop(0))
+            for actor in actors:
+                ray.kill(actor)
+            lp.logger.notice("Stale Ray actors killed")
+
+    def shutdown(self):
+        for actors, _, _ in self.actors.values():
+            for actor in actors:
+                ray.kill(actor)
+        self.actors = OrderedDict()
+        self.checked_out = set()
+        if self.owns_ray and ray.is_initialized():
+            lp.logger.notice("Shutting down Ray")
+            ray.shutdown()
+        self.owns_ray = False
+
+
+_RAY_ACTOR_POOL = _RayActorPool()
+
+
 class RayManager(GenericManager):
-    def __init__(self, **kwargs):
+    def __init__(
+        self, persistent=False, load_balance=False, load_balance_options=None, **kwargs
+    ):
         super().__init__(**kwargs)
-        lp.logger.notice("Ray initialization started")
-        ray.init()
-        lp.logger.notice("Ray initialization complete")
-
-    def split_models(self, Nspm, nproc):
-        # Manage the number of SPM models per worker
-        self.split_index = np.array_split(np.arange(Nspm), nproc)
-        self.spm_per_worker = [len(s) for s in self.split_index]
-        self.slices = []
-        for i in range(nproc):
-            self.slices.append(
-                slice(self.split_index[i][0], self.split_index[i][-1] + 1)
-            )
+        self.persistent = persistent
+        self.load_balance = load_balance
+        self.load_balance_options = {"interval": 20, "threshold": 1.2}
+        if load_balance_options is not None:
+            self.load_balance_options.update(load_balance_options)
+        # Step times of the actors over the last load balancing interval
+        self.actor_step_times = deque(maxlen=self.load_balance_options["interval"])
+        self.pooled = False
+        # Attach to a running Ray session if there is one
+        self.owns_ray = not ray.is_initialized()
+        if self.owns_ray:
+            lp.logger.notice("Ray initialization started")
+            ray.init()
+            lp.logger.notice("Ray initialization complete")
+        else:
+            lp.logger.notice("Attached to running Ray session")
+
+    @staticmethod
+    def shutdown_pool():
+        """
+        Kill the warm actors kept by persistent managers and shut down Ray if
+        it was started by one of them.
+        """
+        _RAY_ACTOR_POOL.shutdown()
+
+    def _pool_key(self, inputs, initial_soc, simlist):
+        # Actors can be reused if their models were built the same way
+        parameters = tuple(
+            (k, str(v)) for k, v in sorted(self.parameter_values.items())
+        )
+        return (
+            self.sim_func,
+            hash(parameters),
+            str(initial_soc),
+            tuple(self.variable_names),
+            tuple(self.spm_per_worker),
+            self.nthreads,
+            tuple(inputs[0].keys()),
+            simlist is None,
+        )
 
     def setup_actors(self, nproc, inputs, initial_soc, simlist):
         tic = ticker.time()
-        # Ray setup an actor for each worker
+        self.steps_since_balance = 0
+        # Whether the actors are held in the pool and kept after the solve
+        self.pooled = False
+        if self.persistent:
+            self.pool_key = self._pool_key(inputs, initial_soc, simlist)
+            pool = _RAY_ACTOR_POOL.checkout(self.pool_key)
+            if pool is not None:
+                # Reuse the warm actors and model, only the states and inputs
+                # change. The actors are mapped again as load balancing may
+                # have changed their number of batteries
+                self.actors, self.event_names, self.objects = pool
+                self.pooled = True
+                self._map_actors(range(nproc), inputs)
+                toc = ticker.time()
+                lp.logger.notice("Ray actors reset in time %.3fs", toc - tic)
+                return
+        # Build the model and casadi functions once for a single battery
+        template = GenericActor()
+        template.setup(
+            Nspm=1,
+            sim_func=self.sim_func,
+            parameter_values=self.parameter_values.copy(),
+            dt=self.dt,
+            inputs=inputs[:1],
+            variable_names=self.variable_names,
+            initial_soc=initial_soc,
+            nproc=1,
+            simlist=simlist,
+        )
+        self.objects = ray.put(template.export_objects())
+        # Ray setup an actor for each worker with a cpu for each thread
         self.actors = []
         for i in range(nproc):
-            self.actors.append(lp.RayActor.remote())
+            self.actors.append(lp.RayActor.options(num_cpus=self.nthreads).remote())
+        self._map_actors(range(nproc), inputs)
+        # Event names do not change so only fetch them once
+        self.event_names = ray.get(self.actors[0].get_event_names.remote())
+        if self.persistent:
+            pool = (self.actors, self.event_names, self.objects)
+            self.pooled = _RAY_ACTOR_POOL.add(self.pool_key, pool)
+            if not self.pooled:
+                lp.logger.notice("Pooled Ray actors in use, actors not kept")
+            elif self.owns_ray:
+                # The pool keeps the Ray session alive after the solve
+                _RAY_ACTOR_POOL.owns_ray = True
+        toc = ticker.time()
+        lp.logger.notice("Ray actors setup in time %.3fs", toc - tic)
+
+    def _map_actors(self, indices, inputs):
+        # Each actor maps the shared functions over its batteries
         setup_futures = []
-        for i, a in enumerate(self.actors):
-            # Create actor on each worker containing a simulation
+        for i in indices:
             setup_futures.append(
-                a.setup.remote(
+                self.actors[i].setup_from_objects.remote(
+                    self.objects,
                     Nspm=self.spm_per_worker[i],
-                    sim_func=self.sim_func,
-                    parameter_values=self.parameter_values,
                     dt=self.dt,
                     inputs=inputs[self.slices[i]],
-                    variable_names=self.variable_names,
-                    initial_soc=initial_soc,
-                    nproc=1,
-                    simlist=simlist,
+                    nproc=self.nthreads,
+                    map_options=self.map_options,
+                    integrator_stats=self.integrator_stats,
                 )
             )
-        _ = [ray.get(f) for f in setup_futures]
-        toc = ticker.time()
-        lp.logger.notice(
-            "Ray actors setup in time " + str(np.around(toc - tic, 3)) + "s"
-        )
+        ray.get(setup_futures)
 
     def step_actors(self):
         t1 = ticker.time()
+        tic = self.profiler.start()
         future_steps = []
         inputs = self.build_inputs()
         for i, pa in enumerate(self.actors):
-            future_steps.append(pa.step.remote(inputs[i]))
-        events = [ray.get(fs) for fs in future_steps]
-        if np.any(events):
-            self.log_event()
+            future_steps.append(pa.step_with_output.remote(inputs[i], self.step_dt))
+        # The output and events of all actors are gathered together
+        results = ray.get(future_steps)
+        self.actor_output = self._gather_output([r[0] for r in results])
+        if np.any([r[1] for r in results]):
+            # Actors without events return no change
+            event_changes = []
+            for i, r in enumerate(results):
+                change = r[2]
+                if change is None:
+                    change = np.zeros([len(self.event_names), self.spm_per_worker[i]])
+                event_changes.append(np.asarray(change))
+            self.log_event(np.hstack(event_changes))
+        step_times = np.array([r[3] for r in results])
+        if self.load_balance:
+            self.actor_step_times.append(step_times)
         t2 = ticker.time()
-        lp.logger.info("Ray actors stepped in " + str(np.around(t2 - t1, 3)) + "s")
+        self.profiler.stop("actor step", tic)
+        # Each actor is drawn on its own row of the trace, the time not
+        # spent stepping the slowest actor is spent moving data
+        for i, r in enumerate(results):
+            self.profiler.add("integration", r[4]["integration"], tic, i + 1)
+            self.profiler.add(
+                "evaluation", r[4]["evaluation"], tic + r[4]["integration"], i + 1
+            )
+        self.profiler.add("ray transfer", max(t2 - t1 - step_times.max(), 0.0))
+        if self.cell_stats is not None:
+            self.cell_stats += self._gather_output([r[5] for r in results])
+        lp.logger.info("Ray actors stepped in %.3fs", t2 - t1)
+
+    def balance_actors(self):
+        # Move batteries between actors so that they take the same time to
+        # step, using the cost per battery measured over the last interval
+        nactors = len(self.actors)
+        if not self.load_balance or nactors < 2:
+            return
+        interval = self.load_balance_options["interval"]
+        self.steps_since_balance += 1
+        if self.steps_since_balance < interval:
+            return
+        self.steps_since_balance = 0
+        times = np.mean(self.actor_step_times, axis=0)
+        if times.max() < self.load_balance_options["threshold"] * times.mean():
+            return
+        cost = np.repeat(times / self.spm_per_worker, self.spm_per_worker)
+        targets = np.sum(cost) * np.arange(1, nactors) / nactors
+        bounds = np.searchsorted(np.cumsum(cost), targets) + 1
+        # Every actor keeps at least one battery
+        for i in range(nactors - 1):
+            lower = i + 1 if i == 0 else bounds[i - 1] + 1
+            upper = self.Nspm - (nactors - 1 - i)
+            bounds[i] = min(max(bounds[i], lower), upper)
+        split_index = np.split(np.arange(self.Nspm), bounds)
+        spm_per_worker = [len(s) for s in split_index]
+        if spm_per_worker == self.spm_per_worker:
+            return
+        states = self.get_actor_states()
+        changed = [
+            i for i in range(nactors) if spm_per_worker[i] != self.spm_per_worker[i]
+        ]
+        self.split_index = split_index
+        self.spm_per_worker = spm_per_worker
+        self.slices = [slice(s[0], s[-1] + 1) for s in split_index]
+        # The inputs only set the initial states, which are then replaced
+        self._map_actors(changed, self.inputs_dict)
+        self.set_actor_states(states)
+        lp.logger.notice("Ray actors rebalanced to " + str(spm_per_worker))
 
     def evaluate_actors(self):
         t1 = ticker.time()
@@ -616,46 +2115,49 @@ class RayManager(GenericManager):
         inputs = self.build_inputs()
         for i, pa in enumerate(self.actors):
             future_evals.append(pa.evaluate.remote(inputs[i]))
-        _ = [ray.get(fs) for fs in future_evals]
+        self.actor_output = self._gather_output(ray.get(future_evals))
         t2 = ticker.time()
-        lp.logger.info("Ray actors evaluated in " + str(np.around(t2 - t1, 3)) + "s")
+        lp.logger.info("Ray actors evaluated in %.3fs", t2 - t1)
 
-    def get_actor_output(self, step):
-        t1 = ticker.time()
-        futures = []
-        for actor in self.actors:
-            futures.append(actor.output.remote())
-        for i, f in enumerate(futures):
-            out = ray.get(f)
-            self.output[:, step, self.split_index[i]] = out
-        t2 = ticker.time()
-        lp.logger.info(
-            "Ray actor output retrieved in " + str(np.around(t2 - t1, 3)) + "s"
-        )
+    def _gather_output(self, results):
+        out = np.zeros([results[0].shape[0], self.Nspm])
+        for i, result in enumerate(results):
+            out[:, self.split_index[i]] = result
+        return out
+
+    def collect_actor_output(self):
+        # The output is returned with the last step or evaluation
+        return self.actor_output
+
+    def store_actor_states(self):
+        ray.get([actor.store_state.remote() for actor in self.actors])
+
+    def restore_actor_states(self):
+        ray.get([actor.restore_state.remote() for actor in self.actors])
+
+    def get_actor_states(self):
+        futures = [actor.get_states.remote() for actor in self.actors]
+        return np.hstack(ray.get(futures))
 
-    def log_event(self):
+    def set_actor_states(self, states):
         futures = []
-        for actor in self.actors:
-            futures.append(actor.get_event_change.remote())
-        all_event_changes = []
-        for i, f in enumerate(futures):
-            all_event_changes.append(np.asarray(ray.get(f)))
-        event_change = np.hstack(all_event_changes)
-        Nr, Nc = event_change.shape
-        event_names = ray.get(self.actors[0].get_event_names.remote())
-        for r in range(Nr):
-            if np.any(event_change[r, :]):
-                lp.logger.warning(
-                    event_names[r]
-                    + ", Batteries: "
-                    + str(np.where(event_change[r, :])[0].tolist())
-                )
+        for i, actor in enumerate(self.actors):
+            futures.append(actor.set_states.remote(states[:, self.split_index[i]]))
+        ray.get(futures)
+
+    def get_actor_state_indices(self, variable_names):
+        return ray.get(self.actors[0].get_state_indices.remote(variable_names))
 
     def cleanup(self):
+        if self.pooled:
+            # Keep the actors warm for the next solve
+            _RAY_ACTOR_POOL.release(self.pool_key)
+            return
         for actor in self.actors:
             ray.kill(actor)
-        lp.logger.notice("Shutting down Ray")
-        ray.shutdown()
+        if self.owns_ray:
+            lp.logger.notice("Shutting down Ray")
+            ray.shutdown()
 
 
 class CasadiManager(GenericManager):
@@ -686,51 +2188,298 @@ class CasadiManager(GenericManager):
                 inputs=inputs,
                 variable_names=self.variable_names,
                 initial_soc=initial_soc,
-                nproc=nproc,
+                nproc=nproc * self.nthreads,
                 simlist=simlist,
+                map_options=self.map_options,
+                integrator_stats=self.integrator_stats,
             )
+        self.event_names = self.actors[0].get_event_names()
         toc = ticker.time()
-        lp.logger.info(
-            "Casadi actor setup in time " + str(np.around(toc - tic, 3)) + "s"
-        )
+        lp.logger.info("Casadi actor setup in time %.3fs", toc - tic)
 
     def step_actors(self):
         tic = ticker.time()
-        events = self.actors[0].step(self.build_inputs()[0])
+        start = self.profiler.start()
+        events = self.actors[0].step(self.build_inputs()[0], self.step_dt)
         if events:
-            self.log_event()
+            self.log_event(self.actors[0].get_event_change())
         toc = ticker.time()
-        lp.logger.info(
-            "Casadi actor stepped in time " + str(np.around(toc - tic, 3)) + "s"
+        self.profiler.stop("actor step", start)
+        timings = self.actors[0].timings
+        self.profiler.add("integration", timings["integration"], start, 1)
+        self.profiler.add(
+            "evaluation", timings["evaluation"], start + timings["integration"], 1
         )
+        if self.cell_stats is not None:
+            self.cell_stats += self.actors[0].integrator_stats
+        lp.logger.info("Casadi actor stepped in time %.3fs", toc - tic)
 
     def evaluate_actors(self):
         tic = ticker.time()
         self.actors[0].evaluate(self.build_inputs()[0])
         toc = ticker.time()
-        lp.logger.info(
-            "Casadi actor evaluated in time " + str(np.around(toc - tic, 3)) + "s"
-        )
+        lp.logger.info("Casadi actor evaluated in time %.3fs", toc - tic)
 
-    def get_actor_output(self, step):
+    def collect_actor_output(self):
         tic = ticker.time()
-        self.output[:, step, :] = self.actors[0].output()
+        out = np.asarray(self.actors[0].output())
         toc = ticker.time()
-        lp.logger.info(
-            "Casadi actor output got in time " + str(np.around(toc - tic, 3)) + "s"
-        )
+        lp.logger.info("Casadi actor output got in time %.3fs", toc - tic)
+        return out
 
-    def log_event(self):
-        event_change = np.asarray(self.actors[0].get_event_change())
-        Nr, Nc = event_change.shape
-        event_names = self.actors[0].get_event_names()
-        for r in range(Nr):
-            if np.any(event_change[r, :]):
-                lp.logger.warning(
-                    event_names[r]
-                    + ", Batteries: "
-                    + str(np.where(event_change[r, :])[0].tolist())
-                )
+    def store_actor_states(self):
+        self.actors[0].store_state()
+
+    def restore_actor_states(self):
+        self.actors[0].restore_state()
+
+    def get_actor_states(self):
+        return self.actors[0].get_states()
+
+    def set_actor_states(self, states):
+        self.actors[0].set_states(states)
+
+    def get_actor_state_indices(self, variable_names):
+        return self.actors[0].get_state_indices(variable_names)
 
     def cleanup(self):
         pass
+
+
+class ProcessPoolManager(GenericManager):
+    def __init__(self, start_method="spawn", timeout=600.0, **kwargs):
+        super().__init__(**kwargs)
+        # Workers are started fresh rather than forked so that they do not
+        # inherit the threads and locks of the parent process
+        self.start_method = start_method
+        # The longest time in seconds to wait for the workers to finish a
+        # command before the pool is shut down with an error
+        self.timeout = timeout
+        self.conns = []
+        self.processes = []
+        self.blocks = {}
+
+    def _create_buffers(self, nproc, inputs):
+        # Shared memory for the command and step size, the battery inputs,
+        # actor output with room for the internal resistance, the integrator
+        # statistics and the event flags
+        self.input_names = list(inputs[0].keys())
+        shapes = {
+            "control": (2,),
+            "inputs": (len(self.input_names), self.Nspm),
+            "output": (self.Nvar + 1, self.Nspm),
+            "stats": (len(_INTEGRATOR_STATS), self.Nspm),
+            "events": (nproc,),
+        }
+        buffers = {}
+        arrays = {}
+        for key, shape in shapes.items():
+            nbytes = max(int(np.prod(shape)) * 8, 8)
+            block = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.blocks[key] = block
+            buffers[key] = (block.name, shape)
+            arrays[key] = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+        self.shm_control = arrays["control"]
+        self.shm_inputs = arrays["inputs"]
+        self.shm_output = arrays["output"]
+        self.shm_stats = arrays["stats"]
+        self.shm_events = arrays["events"]
+        self.shm_events[:] = 0.0
+        return buffers
+
+    def setup_actors(self, nproc, inputs, initial_soc, simlist):
+        tic = ticker.time()
+        buffers = self._create_buffers(nproc, inputs)
+        context = multiprocessing.get_context(self.start_method)
+        # The manager waits at the barrier with the workers to start each
+        # command and takes the semaphore once per worker to finish it
+        self.barrier = context.Barrier(nproc + 1)
+        self.done = context.Semaphore(0)
+        self.conns = []
+        self.processes = []
+        for i in range(nproc):
+            setup_kwargs = {
+                "Nspm": self.spm_per_worker[i],
+                "sim_func": self.sim_func,
+                "parameter_values": self.parameter_values,
+                "dt": self.dt,
+                "inputs": inputs[self.slices[i]],
+                "variable_names": self.variable_names,
+                "initial_soc": initial_soc,
+                "nproc": self.nthreads,
+                "simlist": simlist,
+                "map_options": self.map_options,
+                "integrator_stats": self.integrator_stats,
+            }
+            conn, worker_conn = context.Pipe()
+            process = context.Process(
+                target=_pool_worker,
+                args=(i, worker_conn, self.barrier, self.done, buffers),
+                kwargs={"columns": self.slices[i], "setup_kwargs": setup_kwargs},
+                daemon=True,
+            )
+            process.start()
+            worker_conn.close()
+            self.conns.append(conn)
+            self.processes.append(process)
+        results = [self._receive(i) for i in range(nproc)]
+        self._raise_worker_errors([error for error, _ in results])
+        self.event_names, self.Nrows = results[0][1]
+        # The number of actors is used to split the inputs
+        self.actors = self.processes
+        toc = ticker.time()
+        lp.logger.notice("Process pool setup in time %.3fs", toc - tic)
+
+    def _raise_worker_errors(self, errors):
+        errors = [error for error in errors if error is not None]
+        if len(errors) > 0:
+            if len(self._stopped_workers()) == 0:
+                self.barrier.abort()
+            self.cleanup()
+            raise Exception("Process pool worker failed\n" + errors[0])
+
+    def _stopped_workers(self):
+        return [i for i, p in enumerate(self.processes) if not p.is_alive()]
+
+    def _pool_failed(self, message):
+        # Shut down the pool and report the workers that have stopped. A
+        # worker that stops while waiting at the barrier can not be woken, so
+        # the barrier is only aborted to release the others if all are running
+        stopped = self._stopped_workers()
+        if len(stopped) > 0:
+            message += ", workers " + str(stopped) + " have stopped"
+        else:
+            self.barrier.abort()
+        self.cleanup()
+        raise RuntimeError("Process pool failed: " + message)
+
+    def _receive(self, index):
+        # Wait for a reply from a worker while checking that it is running
+        conn = self.conns[index]
+        tic = ticker.time()
+        while not conn.poll(0.1):
+            if not self.processes[index].is_alive():
+                self._pool_failed("worker " + str(index) + " did not reply")
+            if self.timeout is not None and ticker.time() - tic > self.timeout:
+                timeout = str(self.timeout)
+                self._pool_failed(
+                    "worker " + str(index) + " did not reply within " + timeout + "s"
+                )
+        try:
+            return conn.recv()
+        except EOFError:
+            self._pool_failed("worker " + str(index) + " closed its pipe")
+
+    def _wait_done(self):
+        # Wait for every worker to finish the command while checking that
+        # they are running
+        tic = ticker.time()
+        for _ in range(len(self.processes)):
+            while not self.done.acquire(timeout=0.1):
+                if len(self._stopped_workers()) > 0:
+                    self._pool_failed("workers did not finish the command")
+                if self.timeout is not None and ticker.time() - tic > self.timeout:
+                    timeout = str(self.timeout)
+                    self._pool_failed("command did not finish within " + timeout + "s")
+
+    def _command(self, command, dt=0.0, payloads=None):
+        # Run a command on every worker and wait for them all to finish, the
+        # workers must be running before they are woken from the barrier
+        if len(self._stopped_workers()) > 0:
+            self._pool_failed("workers can not be reached")
+        self.shm_control[0] = command
+        self.shm_control[1] = dt
+        try:
+            self.barrier.wait(self.timeout)
+        except threading.BrokenBarrierError:
+            self._pool_failed("workers did not start the command")
+        if payloads is not None:
+            for i, payload in enumerate(payloads):
+                try:
+                    self.conns[i].send(payload)
+                except OSError:
+                    self._pool_failed("worker " + str(i) + " can not be reached")
+        if command in _REPLY_COMMANDS:
+            results = [self._receive(i) for i in range(len(self.conns))]
+        self._wait_done()
+        if command not in _REPLY_COMMANDS:
+            # Workers only reply to these commands with an error
+            results = [
+                self._receive(i) if conn.poll() else (None, None)
+                for i, conn in enumerate(self.conns)
+            ]
+        self._raise_worker_errors([error for error, _ in results])
+        return [result for _, result in results]
+
+    def _write_inputs(self):
+        self.shm_inputs[:] = self.input_array
+
+    def step_actors(self):
+        tic = ticker.time()
+        start = self.profiler.start()
+        self._write_inputs()
+        self._command(_STEP, dt=self.step_dt)
+        if np.any(self.shm_events):
+            self.log_event(np.hstack(self._command(_EVENT_CHANGE)))
+        toc = ticker.time()
+        self.profiler.stop("actor step", start)
+        if self.cell_stats is not None:
+            self.cell_stats += self.shm_stats
+        lp.logger.info("Process pool stepped in time %.3fs", toc - tic)
+
+    def evaluate_actors(self):
+        self._write_inputs()
+        self._command(_EVALUATE)
+
+    def collect_actor_output(self):
+        # The workers write their output straight to shared memory
+        return self.shm_output[: self.Nrows, :].copy()
+
+    def store_actor_states(self):
+        self._command(_STORE)
+
+    def restore_actor_states(self):
+        self._command(_RESTORE)
+
+    def get_actor_states(self):
+        return np.hstack(self._command(_GET_STATES))
+
+    def set_actor_states(self, states):
+        payloads = [states[:, index] for index in self.split_index]
+        self._command(_SET_STATES, payloads=payloads)
+
+    def get_actor_state_indices(self, variable_names):
+        payloads = [variable_names] * len(self.conns)
+        return self._command(_STATE_INDICES, payloads=payloads)[0]
+
+    def cleanup(self):
+        # Running workers are stopped from the barrier, if any have stopped or
+        # the barrier is broken the workers are terminated
+        stopping = len(self.processes) > 0 and len(self._stopped_workers()) == 0
+        if stopping and not self.barrier.broken:
+            self.shm_control[0] = _STOP
+            try:
+                self.barrier.wait(self.timeout)
+            except threading.BrokenBarrierError:
+                stopping = False
+        else:
+            stopping = False
+        for process in self.processes:
+            # Workers that do not stop in time are terminated
+            if stopping:
+                process.join(self.timeout)
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        for conn in self.conns:
+            conn.close()
+        self.conns = []
+        self.processes = []
+        if len(self.blocks) > 0:
+            del self.shm_control, self.shm_inputs, self.shm_output
+            del self.shm_stats, self.shm_events
+            for block in self.blocks.values():
+                block.close()
+                block.unlink()
+            self.blocks = {}
+        lp.logger.notice("Shutting down process pool")
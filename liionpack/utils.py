@@ -3,7 +3,10 @@
 #
 
 import numpy as np
+import json
 import pathlib
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from scipy.interpolate import interp1d
 
 
@@ -27,6 +30,34 @@ def interp_current(df):
     return f
 
 
+def resample(t_new, t, values):
+    """
+    Linearly interpolate simulation output onto a new time grid
+
+    Args:
+        t_new (np.ndarray):
+            The times to interpolate to.
+        t (np.ndarray):
+            The increasing times that the values are recorded at.
+        values (np.ndarray):
+            Values with the first axis corresponding to time, e.g. an output
+            array of shape - [# steps, # batteries].
+
+    Returns:
+        resampled (np.ndarray):
+            The values at each time in t_new.
+
+    """
+    values = np.asarray(values)
+    if len(t) == 1:
+        return np.repeat(values[:1], len(t_new), axis=0)
+    idx = np.clip(np.searchsorted(t, t_new, side="right") - 1, 0, len(t) - 2)
+    w = (t_new - t[idx]) / (t[idx + 1] - t[idx])
+    w = w.reshape((-1,) + (1,) * (values.ndim - 1))
+    resampled = values[idx] * (1 - w) + values[idx + 1] * w
+    return resampled.astype(values.dtype)
+
+
 def _convert_dict_to_list_of_dict(inputs_dict):
     """
     Convert a dictionary with multiple keys (used as model inputs) into a list
@@ -142,7 +173,8 @@ def save_to_npy(output, path="./npy-results"):
 
     Returns:
         NumPy `.npy` files written to the specified path. Each file represents
-        a single output variable.
+        a single output variable. The names of the variables are written to
+        `variables.json` so that `load_output` can restore them.
     """
 
     # Create folder path for saving files
@@ -150,9 +182,13 @@ def save_to_npy(output, path="./npy-results"):
     path.mkdir(exist_ok=True)
 
     # Save simulation output to npy files
+    names = {}
     for k, v in output.items():
-        filename = k.replace(" ", "_") + ".npy"
-        np.save(path / filename, v)
+        filename = _output_filename(k)
+        np.save(path / (filename + ".npy"), v)
+        names[filename] = k
+    with open(path / "variables.json", "w") as f:
+        json.dump(names, f)
 
 
 def save_to_npzcomp(output, path="."):
@@ -181,3 +217,142 @@ def save_to_npzcomp(output, path="."):
     # Save simulation output to a compressed npz file
     filename = "output.npz"
     np.savez_compressed(path / filename, **output)
+
+
+def _output_filename(key):
+    # File and dataset names can't contain path separators
+    return key.replace(" ", "_").replace("/", "_")
+
+
+def save_to_parquet(
+    output,
+    path="./parquet-results",
+    chunk_steps=1024,
+    compression="zstd",
+    nthreads=None,
+):
+    """
+    Save simulation output to Apache Parquet files where each file represents
+    an output variable. The rows of each file are the steps and the values of
+    all the batteries at a step are stored as a fixed size list, so time
+    slices can be read without reading the whole file. The files are
+    compressed in parallel. Requires pyarrow.
+
+    Args:
+        output (dict):
+            Simulation output dictionary.
+        path (str):
+            Folder path where the `.parquet` files are saved. Default path is a
+            folder named `parquet-results` located in the current directory.
+        chunk_steps (int):
+            The number of steps in each row group. Default is 1024.
+        compression (str):
+            The Parquet compression codec. Default is "zstd".
+        nthreads (int):
+            The number of files written at the same time. Default is None in
+            which case the number of cores is used.
+
+    Returns:
+        Parquet files written to the specified path. Each file represents a
+        single output variable.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Create folder path for saving files
+    path = pathlib.Path(path)
+    path.mkdir(exist_ok=True)
+
+    def write(key, value):
+        value = np.ascontiguousarray(value)
+        shape = value.shape
+        rows = value.reshape(shape[0], -1) if value.ndim > 1 else value
+        if value.ndim > 1 and rows.shape[1] > 0:
+            flat = pa.array(rows.ravel())
+            column = pa.FixedSizeListArray.from_arrays(flat, rows.shape[1])
+        else:
+            column = pa.array(rows.ravel())
+        metadata = {"name": key, "shape": json.dumps(list(shape))}
+        table = pa.table({"values": column}, metadata=metadata)
+        filename = _output_filename(key) + ".parquet"
+        pq.write_table(
+            table,
+            path / filename,
+            row_group_size=chunk_steps,
+            compression=compression,
+        )
+
+    with ThreadPoolExecutor(max_workers=nthreads) as executor:
+        futures = [executor.submit(write, k, v) for k, v in output.items()]
+        for future in futures:
+            future.result()
+
+
+def save_to_hdf5(output, path=".", chunk_steps=1024, level=4, nthreads=None):
+    """
+    Save simulation output to a chunked HDF5 `output.h5` file with a gzip
+    compressed dataset for each output variable. Each chunk holds a block of
+    steps for all the batteries so time slices can be read without reading
+    the whole dataset. The chunks are compressed in parallel and written
+    directly to the file. Requires h5py.
+
+    Args:
+        output (dict):
+            Simulation output dictionary.
+        path (str):
+            Path where the `output.h5` file is saved. Default path is the
+            current directory.
+        chunk_steps (int):
+            The number of steps in each chunk. Default is 1024.
+        level (int):
+            The gzip compression level from 0 to 9. Default is 4.
+        nthreads (int):
+            The number of threads used to compress the chunks. Default is None
+            in which case the number of cores is used.
+
+    Returns:
+        An HDF5 file named `output.h5` written to the specified path. Each
+        dataset represents a single output variable and has the name of the
+        variable as its "name" attribute.
+    """
+    import h5py
+
+    # Create a path for saving the file
+    path = pathlib.Path(path)
+    path.mkdir(exist_ok=True)
+
+    def compress(block):
+        return zlib.compress(block, level)
+
+    with (
+        h5py.File(path / "output.h5", "w") as f,
+        ThreadPoolExecutor(max_workers=nthreads) as executor,
+    ):
+        for key, value in output.items():
+            value = np.ascontiguousarray(value)
+            name = _output_filename(key)
+            if value.size == 0:
+                dset = f.create_dataset(name, data=value)
+            else:
+                n = min(chunk_steps, value.shape[0])
+                chunks = (n,) + value.shape[1:]
+                dset = f.create_dataset(
+                    name,
+                    shape=value.shape,
+                    dtype=value.dtype,
+                    chunks=chunks,
+                    compression="gzip",
+                    compression_opts=level,
+                )
+                # Whole chunks are compressed from views of the output and
+                # written directly, a partial edge chunk is written through
+                # the dataset so that no block is copied
+                full = value.shape[0] - value.shape[0] % n
+                offsets = range(0, full, n)
+                blocks = (value[start : start + n] for start in offsets)
+                for start, data in zip(offsets, executor.map(compress, blocks)):
+                    offset = (start,) + (0,) * (value.ndim - 1)
+                    dset.id.write_direct_chunk(offset, data)
+                if full < value.shape[0]:
+                    dset[full:] = value[full:]
+            dset.attrs["name"] = key
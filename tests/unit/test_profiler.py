@@ -0,0 +1,60 @@
+import liionpack as lp
+import numpy as np
+import json
+import os
+import tempfile
+import unittest
+
+
+class profilerTest(unittest.TestCase):
+    def setUp(self):
+        self.profiler = lp.Profiler()
+        for duration in np.arange(1, 101) * 1e-3:
+            self.profiler.add("circuit solve", duration)
+        tic = self.profiler.start()
+        self.profiler.stop("integration", tic)
+        for value in [10, 20, 30]:
+            self.profiler.count("integrator steps", value)
+
+    def test_summary(self):
+        summary = self.profiler.summary()
+        self.assertEqual(
+            list(summary.keys()), ["circuit solve", "integration", "integrator steps"]
+        )
+        solve = summary["circuit solve"]
+        self.assertEqual(solve["count"], 100)
+        self.assertAlmostEqual(solve["total"], 5.05)
+        self.assertAlmostEqual(solve["min"], 1e-3)
+        self.assertAlmostEqual(solve["max"], 0.1)
+        self.assertAlmostEqual(solve["p50"], 0.0505)
+        self.assertAlmostEqual(solve["p99"], 0.09901)
+        self.assertEqual(summary["integration"]["count"], 1)
+        steps = summary["integrator steps"]
+        self.assertEqual(steps["count"], 3)
+        self.assertAlmostEqual(steps["total"], 60.0)
+        self.assertAlmostEqual(steps["p50"], 20.0)
+
+    def test_to_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "profile.json")
+            text = self.profiler.to_json(filename)
+            with open(filename) as f:
+                self.assertEqual(json.load(f), json.loads(text))
+        self.assertEqual(json.loads(text)["circuit solve"]["count"], 100)
+
+    def test_to_chrome_trace(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "trace.json")
+            self.profiler.to_chrome_trace(filename)
+            with open(filename) as f:
+                trace = json.load(f)
+        events = trace["traceEvents"]
+        self.assertEqual(len(events), 104)
+        self.assertEqual(events[0]["ph"], "X")
+        self.assertAlmostEqual(events[99]["dur"], 1e5)
+        self.assertEqual(events[-1]["ph"], "C")
+        self.assertEqual(events[-1]["args"], {"integrator steps": 30.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -46,6 +46,20 @@ class protocolsTest(unittest.TestCase):
         assert len(p[0]) == 601
         assert np.allclose(np.mean(p), 0.8404807891846922)
 
+    def test_exclude_initial_state(self):
+        experiment = pybamm.Experiment(
+            [
+                "Discharge at 50 A for 5 minutes",
+            ],
+            period="10 seconds",
+        )
+        p, _, _ = lp.generate_protocol_from_experiment(experiment)
+        q, _, _ = lp.generate_protocol_from_experiment(
+            experiment, include_initial_state=False
+        )
+        self.assertEqual(len(p[0]), 31)
+        self.assertEqual(len(q[0]), 30)
+
     def test_current_exception(self):
         def bad_current():
             experiment = pybamm.Experiment(
@@ -0,0 +1,47 @@
+import liionpack as lp
+import pybamm
+import numpy as np
+import unittest
+
+
+class sessionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        self.netlist = lp.setup_circuit(
+            Np=4, Ns=1, Rb=1e-4, Rc=1e-2, Ri=5e-2, V=3.6, I=10.0
+        )
+        self.parameter_values = pybamm.ParameterValues("Chen2020")
+        self.steps1 = ["Discharge at 10 A for 60 seconds", "Rest for 1 minutes"]
+        self.steps2 = ["Charge at 5 A for 60 seconds"]
+
+    def test_run(self):
+        experiment = pybamm.Experiment(self.steps1 + self.steps2, period="10 seconds")
+        full = lp.solve(
+            netlist=self.netlist.copy(),
+            parameter_values=self.parameter_values,
+            experiment=experiment,
+            initial_soc=0.5,
+        )
+        with lp.PackSession(
+            self.netlist.copy(), self.parameter_values, initial_soc=0.5
+        ) as session:
+            output1 = session.run(pybamm.Experiment(self.steps1, period="10 seconds"))
+            actors = session.manager.actors
+            output2 = session.run(pybamm.Experiment(self.steps2, period="10 seconds"))
+            # The actors are reused
+            self.assertIs(session.manager.actors, actors)
+            # Running experiments does not hide the step method
+            self.assertTrue(callable(session.manager.step))
+            output = session.output
+        self.assertEqual(len(output1["Time [s]"]) + len(output2["Time [s]"]), 19)
+        self.assertTrue(np.allclose(output["Time [s]"], full["Time [s]"]))
+        for key in ["Terminal voltage [V]", "Cell current [A]"]:
+            self.assertTrue(np.allclose(output[key], full[key], atol=1e-3))
+
+    def test_manager(self):
+        with self.assertRaises(ValueError):
+            lp.PackSession(self.netlist, self.parameter_values, manager="spam")
+
+
+if __name__ == "__main__":
+    unittest.main()
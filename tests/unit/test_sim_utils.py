@@ -36,6 +36,19 @@ class sim_utilsTest(unittest.TestCase):
             # a = param["Initial concentration in negative electrode [mol.m-3]"]
             # assert a == neg_conc
 
+    def test_get_state_indices(self):
+        sim = lp.basic_simulation(self.param)
+        sim.build()
+        model = sim.built_model
+        all_indices = lp.get_state_indices(model)
+        self.assertEqual(len(all_indices), model.concatenated_rhs.size)
+        var = "X-averaged negative particle concentration [mol.m-3]"
+        indices = lp.get_state_indices(model, [var])
+        self.assertGreater(len(indices), 0)
+        self.assertLess(len(indices), len(all_indices))
+        with self.assertRaises(ValueError):
+            lp.get_state_indices(model, ["Time [s]"])
+
 
 if __name__ == "__main__":
     unittest.main()
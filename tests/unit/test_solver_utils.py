@@ -1,6 +1,9 @@
 import liionpack as lp
 import pybamm
 import numpy as np
+import casadi
+import contextlib
+import io
 import matplotlib.pyplot as plt
 import unittest
 
@@ -34,8 +37,36 @@ class solver_utilsTest(unittest.TestCase):
     def test_mapped_step(self):
         pass
 
-    def test_create_casadi_objects(self):
-        pass
+    def test_map_options(self):
+        from liionpack.solver_utils import _map_casadi_function
+        from liionpack.solver_utils import _resolve_map_options
+
+        with self.assertLogs(lp.logger, level="NOTICE") as logs:
+            par, nthreads, _ = _resolve_map_options(4, 8)
+        self.assertEqual(par, "serial")
+        self.assertIn("Auto mapping uses 1 of 8 threads", logs.output[0])
+        par, nthreads, _ = _resolve_map_options(64, 2, {"parallelization": "thread"})
+        self.assertEqual((par, nthreads), ("thread", 2))
+        with self.assertRaises(ValueError):
+            _resolve_map_options(64, 2, {"parallelization": "gpu"})
+        x = casadi.MX.sym("x")
+        fn = casadi.Function("fn", [x], [x**2])
+        values = np.arange(12.0).reshape(1, -1)
+        for map_options in [
+            {"parallelization": "serial"},
+            {"parallelization": "thread"},
+            {"parallelization": "thread", "chunk_size": 4},
+            {"parallelization": "thread", "chunk_size": 5},
+        ]:
+            mapped = _map_casadi_function(fn, 12, 2, map_options)
+            self.assertTrue(np.allclose(mapped(values), values**2))
+        # A prime number of batteries can't be chunked
+        map_options = {"parallelization": "thread", "chunk_size": 4}
+        with self.assertLogs(lp.logger, level="NOTICE") as logs:
+            mapped = _map_casadi_function(fn, 13, 2, map_options)
+        self.assertIn("Batteries are not chunked", logs.output[0])
+        values = np.arange(13.0).reshape(1, -1)
+        self.assertTrue(np.allclose(mapped(values), values**2))
 
     def test_solve(self):
         output1 = lp.solve(
@@ -119,6 +150,123 @@ class solver_utilsTest(unittest.TestCase):
         self.assertEqual(output["Terminal voltage [V]"].shape, (31, 32))
         plt.close("all")
 
+    def test_solve_cycles(self):
+        netlist = lp.setup_circuit(Np=2, Ns=1, Rb=1e-4, Rc=1e-2, Ri=5e-2, V=3.6)
+        steps = [
+            "Discharge at 5 A for 2 minutes",
+            "Charge at 5 A for 2 minutes",
+        ]
+        cycle = pybamm.Experiment(steps, period="20 seconds")
+        n_cycles = 10
+        outputs = lp.solve_cycles(
+            netlist=netlist.copy(),
+            parameter_values=self.parameter_values,
+            experiment=cycle,
+            n_cycles=n_cycles,
+            initial_soc=0.5,
+        )
+        self.assertIn(1, outputs)
+        self.assertIn(n_cycles, outputs)
+        self.assertLess(len(outputs), n_cycles)
+        self.assertEqual(outputs[n_cycles]["Terminal voltage [V]"].shape, (12, 2))
+        full = lp.solve(
+            netlist=netlist.copy(),
+            parameter_values=self.parameter_values,
+            experiment=pybamm.Experiment(steps * n_cycles, period="20 seconds"),
+            initial_soc=0.5,
+        )
+        a = outputs[n_cycles]["Terminal voltage [V]"]
+        b = full["Terminal voltage [V]"][-12:]
+        self.assertTrue(np.allclose(a, b, atol=1e-3))
+
+    def test_solve_profile(self):
+        output, profiler = lp.solve(
+            netlist=self.netlist.copy(),
+            parameter_values=self.parameter_values,
+            experiment=self.experiment,
+            initial_soc=0.5,
+            profile=True,
+        )
+        self.assertEqual(output["Terminal voltage [V]"].shape, (31, 32))
+        summary = profiler.summary()
+        for phase in [
+            "setup",
+            "circuit assembly",
+            "circuit factorisation",
+            "circuit solve",
+            "power loss",
+            "actor step",
+            "integration",
+            "evaluation",
+            "output copy",
+        ]:
+            self.assertIn(phase, summary)
+        self.assertEqual(summary["setup"]["count"], 1)
+        self.assertEqual(summary["integration"]["count"], 31)
+        self.assertGreater(summary["integration"]["total"], 0.0)
+
+    def test_solve_progress(self):
+        reports = []
+
+        def progress(step, nsteps, time):
+            reports.append((step, nsteps, time))
+
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            lp.solve(
+                netlist=self.netlist.copy(),
+                parameter_values=self.parameter_values,
+                experiment=self.experiment,
+                initial_soc=0.5,
+                progress=False,
+            )
+        self.assertEqual(stdout.getvalue(), "")
+        lp.solve(
+            netlist=self.netlist.copy(),
+            parameter_values=self.parameter_values,
+            experiment=self.experiment,
+            initial_soc=0.5,
+            progress=progress,
+            progress_interval=0.0,
+        )
+        self.assertEqual(len(reports), 32)
+        self.assertEqual(reports[0][:2], (1, 31))
+        self.assertEqual(reports[-1], (31, 31, 310.0))
+        # Only the first and last steps are reported with a long interval
+        reports.clear()
+        lp.solve(
+            netlist=self.netlist.copy(),
+            parameter_values=self.parameter_values,
+            experiment=self.experiment,
+            initial_soc=0.5,
+            progress=progress,
+            progress_interval=1e6,
+        )
+        self.assertEqual([r[0] for r in reports], [1, 31])
+
+    def test_solve_integrator_stats(self):
+        output, profiler = lp.solve(
+            netlist=self.netlist.copy(),
+            parameter_values=self.parameter_values,
+            experiment=self.experiment,
+            initial_soc=0.5,
+            nproc=2,
+            profile=True,
+            integrator_stats=True,
+        )
+        for name in [
+            "integrator steps",
+            "Newton iterations",
+            "error test failures",
+            "Jacobian evaluations",
+        ]:
+            cells = output["Cell " + name]
+            pack = output["Pack " + name]
+            self.assertEqual(cells.shape, (31, 32))
+            self.assertTrue(np.allclose(cells.sum(axis=1), pack))
+            self.assertAlmostEqual(profiler.summary()[name]["total"], pack.sum())
+        self.assertTrue(np.all(output["Cell integrator steps"] > 0))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,9 @@
 import liionpack as lp
 import pybamm
 import numpy as np
+import os
+import ray
+import tempfile
 import unittest
 
 
@@ -31,7 +34,7 @@ class solversTest(unittest.TestCase):
         )
         # PyBaMM parameters
         self.parameter_values = pybamm.ParameterValues("Chen2020")
-        self.managers = ["casadi", "ray"]
+        self.managers = ["casadi", "ray", "process"]
 
     def test_multiprocessing(self):
         for manager in self.managers:
@@ -60,6 +63,74 @@ class solversTest(unittest.TestCase):
             self.assertEqual(a.shape, (31, 21))
             self.assertTrue(np.allclose(a, b))
 
+    def test_hybrid_parallelism(self):
+        for manager in self.managers:
+            output1 = lp.solve(
+                netlist=self.netlist.copy(),
+                parameter_values=self.parameter_values,
+                experiment=self.experiment,
+                initial_soc=0.5,
+                nproc=1,
+                manager=manager,
+            )
+            output2 = lp.solve(
+                netlist=self.netlist.copy(),
+                parameter_values=self.parameter_values,
+                experiment=self.experiment,
+                initial_soc=0.5,
+                nproc=(2, 2),
+                manager=manager,
+            )
+            a = output1["Terminal voltage [V]"]
+            b = output2["Terminal voltage [V]"]
+            self.assertTrue(np.allclose(a, b))
+
+    def test_load_balance(self):
+        output1 = lp.solve(
+            netlist=self.netlist.copy(),
+            parameter_values=self.parameter_values,
+            experiment=self.experiment,
+            initial_soc=0.5,
+            nproc=1,
+            manager="casadi",
+        )
+        output2 = lp.solve(
+            netlist=self.netlist.copy(),
+            parameter_values=self.parameter_values,
+            experiment=self.experiment,
+            initial_soc=0.5,
+            nproc=2,
+            manager="ray",
+            load_balance=True,
+            load_balance_options={"interval": 2, "threshold": 1.0},
+        )
+        a = output1["Terminal voltage [V]"]
+        b = output2["Terminal voltage [V]"]
+        self.assertTrue(np.allclose(a, b))
+        # Batteries move away from an actor that is slower per battery
+        rm = lp.RayManager(load_balance=True, load_balance_options={"interval": 2})
+        rm.solve(
+            netlist=self.netlist.copy(),
+            sim_func=None,
+            parameter_values=self.parameter_values,
+            experiment=self.experiment,
+            inputs=None,
+            output_variables=None,
+            initial_soc=0.5,
+            nproc=2,
+            simlist=None,
+            setup_only=True,
+        )
+        self.assertEqual(rm.spm_per_worker, [11, 10])
+        states = rm.get_actor_states()
+        for _ in range(2):
+            rm.actor_step_times.append(np.array([3.0, 1.0]))
+            rm.balance_actors()
+        self.assertLess(rm.spm_per_worker[0], 11)
+        self.assertEqual(sum(rm.spm_per_worker), self.Nspm)
+        self.assertTrue(np.allclose(rm.get_actor_states(), states))
+        rm.cleanup()
+
     def test_events(self):
         for manager in self.managers:
             output1 = lp.solve(
@@ -87,6 +158,90 @@ class solversTest(unittest.TestCase):
             self.assertEqual(a.shape, (7, 21))
             self.assertTrue(np.allclose(a, b))
 
+    def test_persistent_actors(self):
+        experiment = pybamm.Experiment(
+            ["Discharge at 20 A for 1 minutes"], period="10 seconds"
+        )
+        ray_running = ray.is_initialized()
+        outputs = []
+        for _ in range(2):
+            outputs.append(
+                lp.solve(
+                    netlist=self.netlist.copy(),
+                    parameter_values=self.parameter_values,
+                    experiment=experiment,
+                    initial_soc=0.5,
+                    nproc=1,
+                    manager="ray",
+                    persistent_actors=True,
+                )
+            )
+            self.assertEqual(len(lp.solvers._RAY_ACTOR_POOL.actors), 1)
+        lp.RayManager.shutdown_pool()
+        self.assertEqual(len(lp.solvers._RAY_ACTOR_POOL.actors), 0)
+        # Ray is only shut down if the pool started it
+        self.assertEqual(ray.is_initialized(), ray_running)
+        a = outputs[0]["Terminal voltage [V]"]
+        b = outputs[1]["Terminal voltage [V]"]
+        self.assertTrue(np.allclose(a, b))
+
+    def test_actor_pool(self):
+        pool = lp.solvers._RayActorPool()
+        a = ([lp.RayActor.remote()], [], None)
+        b = ([lp.RayActor.remote()], [], None)
+        self.assertTrue(pool.add("a", a))
+        # Actors in use are not shared
+        self.assertIsNone(pool.checkout("a"))
+        self.assertFalse(pool.add("a", b))
+        pool.release("a")
+        self.assertIs(pool.checkout("a"), a)
+        pool.release("a")
+        # A new setup replaces the idle actors
+        self.assertTrue(pool.add("b", b))
+        self.assertEqual(list(pool.actors.keys()), ["b"])
+        pool.release("b")
+        pool.shutdown()
+        self.assertEqual(len(pool.actors), 0)
+
+    def test_actor_from_objects(self):
+        parameter_values = self.parameter_values.copy()
+        parameter_values.update({"Current function [A]": "[input]"})
+        variable_names = [
+            "Terminal voltage [V]",
+            "Surface open-circuit voltage [V]",
+        ]
+        inputs = lp.build_inputs_dict(np.array([1.0, 2.0, 3.0]), None, None)
+        template = lp.GenericActor()
+        template.setup(
+            Nspm=1,
+            sim_func=None,
+            parameter_values=parameter_values,
+            dt=10,
+            inputs=inputs[:1],
+            variable_names=variable_names,
+            initial_soc=0.5,
+            nproc=1,
+            simlist=None,
+        )
+        objects = template.export_objects()
+        for nproc in [1, 2]:
+            actor = lp.GenericActor()
+            actor.setup_from_objects(objects, Nspm=3, dt=10, inputs=inputs, nproc=nproc)
+            actor.step(inputs, 10)
+            output = np.asarray(actor.output())
+            self.assertEqual(output.shape, (actor.Nrows, 3))
+            # Higher currents give lower voltages
+            self.assertTrue(np.all(np.diff(output[0, :]) < 0))
+        template.step(inputs[:1], 10)
+        self.assertTrue(np.allclose(np.asarray(template.output())[:, 0], output[:, 0]))
+        # The inputs can also be passed as an array with a column per battery
+        actor.reset(inputs)
+        actor.step(np.array([[1.0, 2.0, 3.0]]), 10)
+        self.assertTrue(np.allclose(np.asarray(actor.output()), output))
+        # New states are not compared with the events of the old ones
+        actor.set_states(actor.get_states())
+        self.assertIsNone(actor.last_events)
+
     def test_voltage_limits(self):
         I_app = 5.0
         netlist = lp.setup_circuit(
@@ -154,6 +309,489 @@ class solversTest(unittest.TestCase):
         )
         assert True
 
+    def test_adaptive(self):
+        I_app = 5.0
+        netlist = lp.setup_circuit(
+            Np=2, Ns=1, Rb=1e-4, Rc=1e-2, Ri=3e-2, V=3.6, I=I_app
+        )
+        parameter_values = pybamm.ParameterValues("Chen2020")
+        experiment = pybamm.Experiment(
+            [
+                f"Discharge at {I_app} A for 5 minutes",
+                "Rest for 20 minutes",
+            ],
+            period="10 seconds",
+        )
+        outputs = []
+        for adaptive in [False, True]:
+            outputs.append(
+                lp.solve(
+                    netlist=netlist.copy(),
+                    parameter_values=parameter_values,
+                    experiment=experiment,
+                    initial_soc=0.5,
+                    nproc=1,
+                    manager="casadi",
+                    adaptive=adaptive,
+                )
+            )
+        fixed, adaptive = outputs
+        t_fixed = fixed["Time [s]"]
+        t_adaptive = adaptive["Time [s]"]
+        self.assertLess(len(t_adaptive), len(t_fixed))
+        self.assertTrue(np.all(np.diff(t_adaptive) > 0))
+        self.assertEqual(t_adaptive[-1] % 10, 0)
+        v_fixed = fixed["Pack terminal voltage [V]"]
+        v_adaptive = np.interp(
+            t_fixed, t_adaptive, adaptive["Pack terminal voltage [V]"]
+        )
+        self.assertTrue(np.allclose(v_fixed, v_adaptive, atol=5e-3))
+
+    def test_adaptive_refinement(self):
+        I_app = 5.0
+        netlist = lp.setup_circuit(
+            Np=2, Ns=1, Rb=1e-4, Rc=1e-2, Ri=3e-2, V=3.6, I=I_app
+        )
+        parameter_values = pybamm.ParameterValues("Chen2020")
+        experiment = pybamm.Experiment(
+            [
+                f"Discharge at {I_app} A for 10 minutes",
+                "Rest for 10 minutes",
+            ],
+            period="60 seconds",
+        )
+        output, profiler = lp.solve(
+            netlist=netlist,
+            parameter_values=parameter_values,
+            experiment=experiment,
+            initial_soc=0.5,
+            nproc=1,
+            manager="casadi",
+            adaptive=True,
+            adaptive_options={"voltage_tol": 1e-4, "max_substeps": 4},
+            profile=True,
+        )
+        t = output["Time [s]"]
+        # Periods are divided into substeps that are not recorded
+        n_steps = profiler.summary()["actor step"]["count"]
+        self.assertGreater(n_steps, len(t))
+        self.assertLessEqual(n_steps, 4 * len(t))
+        self.assertTrue(np.allclose(t % 60, 0))
+        self.assertEqual(t[-1], 1200)
+        # Substeps don't count towards recording every k-th step
+        output = lp.solve(
+            netlist=netlist,
+            parameter_values=parameter_values,
+            experiment=experiment,
+            initial_soc=0.5,
+            nproc=1,
+            manager="casadi",
+            adaptive=True,
+            adaptive_options={"voltage_tol": 1e-4, "max_substeps": 4},
+            record_options={"every": 2},
+        )
+        self.assertEqual(len(output["Time [s]"]), (len(t) + 1) // 2)
+        self.assertTrue(np.allclose(output["Time [s]"], t[::2]))
+
+    def test_mixed_periods(self):
+        I_app = 5.0
+        netlist = lp.setup_circuit(
+            Np=2, Ns=1, Rb=1e-4, Rc=1e-2, Ri=3e-2, V=3.6, I=I_app
+        )
+        parameter_values = pybamm.ParameterValues("Chen2020")
+        experiment = pybamm.Experiment(
+            [
+                f"Discharge at {I_app} A for 2 minutes",
+                "Rest for 10 minutes (1 minute period)",
+            ],
+            period="10 seconds",
+        )
+        output = lp.solve(
+            netlist=netlist.copy(),
+            parameter_values=parameter_values,
+            experiment=experiment,
+            initial_soc=0.5,
+            nproc=1,
+            manager="casadi",
+        )
+        time = output["Time [s]"]
+        self.assertEqual(len(time), 23)
+        self.assertTrue(np.allclose(np.diff(time[:13]), 10.0))
+        self.assertTrue(np.allclose(np.diff(time[13:]), 60.0))
+
+    def test_internal_resistance(self):
+        I_app = 5.0
+        netlist = lp.setup_circuit(
+            Np=2, Ns=1, Rb=1e-4, Rc=1e-2, Ri=3e-2, V=3.6, I=I_app
+        )
+        parameter_values = pybamm.ParameterValues("Chen2020")
+        experiment = pybamm.Experiment(
+            [
+                f"Discharge at {I_app} A for 2 minutes",
+                "Rest for 2 minutes",
+            ],
+            period="10 seconds",
+        )
+        output = lp.solve(
+            netlist=netlist,
+            parameter_values=parameter_values,
+            experiment=experiment,
+            initial_soc=0.5,
+            nproc=1,
+            manager="casadi",
+        )
+        Ri = output["Cell internal resistance [Ohm]"]
+        self.assertTrue(np.all(np.isfinite(Ri)))
+        self.assertTrue(np.all(Ri > 0))
+        # The resistance is still updated through the rest without diverging
+        rest = Ri[13:]
+        self.assertFalse(np.allclose(rest[0], rest[-1], rtol=0, atol=0))
+        self.assertTrue(np.allclose(rest, Ri[1], rtol=0.5))
+
+    def test_implicit_coupling(self):
+        I_app = 20.0
+        netlist = lp.setup_circuit(
+            Np=4, Ns=1, Rb=1e-3, Rc=1e-2, Ri=5e-2, V=3.2, I=I_app
+        )
+        Rc = netlist.desc.str.startswith("Rc")
+        netlist.loc[Rc, "value"] = [1e-4, 1e-3, 5e-3, 2e-2]
+        parameter_values = pybamm.ParameterValues("Chen2020")
+        outputs = []
+        for period, implicit in [(5, False), (60, False), (60, True)]:
+            experiment = pybamm.Experiment(
+                [f"Discharge at {I_app} A for 10 minutes"],
+                period=f"{period} seconds",
+            )
+            outputs.append(
+                lp.solve(
+                    netlist=netlist.copy(),
+                    parameter_values=parameter_values,
+                    experiment=experiment,
+                    initial_soc=0.5,
+                    nproc=1,
+                    manager="casadi",
+                    implicit_coupling=implicit,
+                )
+            )
+        reference, explicit, implicit = outputs
+        # Compare with the mean reference current over each long step
+        I_ref = reference["Cell current [A]"][:-1]
+        I_ref = I_ref.reshape(-1, 12, 4).mean(axis=1)
+        err_explicit = np.abs(explicit["Cell current [A]"][1:-1] - I_ref[1:])
+        err_implicit = np.abs(implicit["Cell current [A]"][1:-1] - I_ref[1:])
+        self.assertLess(err_implicit.max(), 0.5 * err_explicit.max())
+        self.assertTrue(np.allclose(implicit["Cell current [A]"].sum(axis=1), I_app))
+
+    def test_rest_fast_forward(self):
+        I_app = 5.0
+        netlist = lp.setup_circuit(
+            Np=2, Ns=1, Rb=1e-4, Rc=1e-2, Ri=3e-2, V=3.6, I=I_app
+        )
+        parameter_values = pybamm.ParameterValues("Chen2020")
+        experiment = pybamm.Experiment(
+            [
+                f"Discharge at {I_app} A for 5 minutes",
+                "Rest for 20 minutes",
+                f"Charge at {I_app} A for 1 minutes",
+            ],
+            period="10 seconds",
+        )
+        managers = [lp.CasadiManager(), lp.CasadiManager()]
+        outputs = []
+        for rm, fast_forward in zip(managers, [False, True]):
+            outputs.append(
+                rm.solve(
+                    netlist=netlist.copy(),
+                    sim_func=None,
+                    parameter_values=parameter_values,
+                    experiment=experiment,
+                    inputs=None,
+                    output_variables=None,
+                    initial_soc=0.5,
+                    nproc=1,
+                    simlist=None,
+                    rest_fast_forward=fast_forward,
+                )
+            )
+        fixed, fast = outputs
+        self.assertLess(managers[1].global_step, managers[0].global_step)
+        self.assertTrue(np.allclose(fixed["Time [s]"], fast["Time [s]"]))
+        v_fixed = fixed["Terminal voltage [V]"]
+        v_fast = fast["Terminal voltage [V]"]
+        self.assertEqual(v_fixed.shape, v_fast.shape)
+        self.assertTrue(np.allclose(v_fixed, v_fast, atol=2e-3))
+
+    def test_output_sink(self):
+        experiment = pybamm.Experiment(
+            ["Discharge at 20 A for 60 seconds"], period="10 seconds"
+        )
+        kwargs = dict(
+            parameter_values=self.parameter_values,
+            experiment=experiment,
+            initial_soc=0.5,
+        )
+        output1 = lp.solve(netlist=self.netlist.copy(), **kwargs)
+        with tempfile.TemporaryDirectory() as directory:
+            sink = lp.MemmapSink(directory, flush_interval=2)
+            output2 = lp.solve(netlist=self.netlist.copy(), output_sink=sink, **kwargs)
+            for key in output1.keys():
+                self.assertIsInstance(output2[key], np.memmap)
+                self.assertTrue(np.allclose(output1[key], output2[key]))
+            V = np.load(os.path.join(directory, "pack_voltage.npy"), mmap_mode="r")
+            a = output1["Pack terminal voltage [V]"]
+            self.assertTrue(np.allclose(V[: len(a)], a))
+            del output2, sink, V
+
+    def test_record_options(self):
+        experiment = pybamm.Experiment(
+            ["Discharge at 20 A for 100 seconds"], period="10 seconds"
+        )
+        kwargs = dict(
+            parameter_values=self.parameter_values,
+            experiment=experiment,
+            initial_soc=0.5,
+        )
+        full = lp.solve(netlist=self.netlist.copy(), **kwargs)
+        cells = [0, 5, 20]
+        output = lp.solve(
+            netlist=self.netlist.copy(),
+            record_options={"every": 3, "cells": cells, "nodes": [0, 1]},
+            **kwargs,
+        )
+        self.assertEqual(output["Time [s]"].shape, (4,))
+        self.assertTrue(np.allclose(output["Time [s]"], full["Time [s]"][::3]))
+        a = full["Terminal voltage [V]"][::3, cells]
+        self.assertTrue(np.allclose(output["Terminal voltage [V]"], a))
+        a = full["Node voltage [V]"][::3, :2]
+        self.assertTrue(np.allclose(output["Node voltage [V]"], a))
+        # Pack only
+        output = lp.solve(
+            netlist=self.netlist.copy(),
+            record_options={"cells": [], "nodes": []},
+            **kwargs,
+        )
+        self.assertEqual(output["Cell current [A]"].shape, (11, 0))
+        a = full["Pack terminal voltage [V]"]
+        self.assertTrue(np.allclose(output["Pack terminal voltage [V]"], a))
+        # Record every step once the lowest voltage crosses a threshold
+        V_min = full["Terminal voltage [V]"].min(axis=1)
+        trigger = {
+            "variable": "Terminal voltage [V]",
+            "lower": V_min[7],
+            "window": 2,
+        }
+        output = lp.solve(
+            netlist=self.netlist.copy(),
+            record_options={"every": 5, "trigger": trigger},
+            **kwargs,
+        )
+        steps = [0, 5] + [i for i in range(11) if V_min[i] < V_min[7]] + [10]
+        steps = np.unique(steps)
+        self.assertTrue(np.allclose(output["Time [s]"], full["Time [s]"][steps]))
+
+    def test_record_summary(self):
+        experiment = pybamm.Experiment(
+            ["Discharge at 20 A for 60 seconds"], period="10 seconds"
+        )
+        kwargs = dict(
+            parameter_values=self.parameter_values,
+            experiment=experiment,
+            initial_soc=0.5,
+        )
+        full = lp.solve(netlist=self.netlist.copy(), **kwargs)
+        output = lp.solve(
+            netlist=self.netlist.copy(),
+            record_options={"summary": True, "percentiles": [50]},
+            **kwargs,
+        )
+        self.assertNotIn("Terminal voltage [V]", output.keys())
+        I = full["Cell current [A]"]
+        self.assertTrue(np.allclose(output["Cell current [A] min"], I.min(axis=1)))
+        self.assertTrue(np.allclose(output["Cell current [A] std"], I.std(axis=1)))
+        p50 = np.percentile(I, 50, axis=1)
+        self.assertTrue(np.allclose(output["Cell current [A] p50"], p50))
+        V = full["Terminal voltage [V]"]
+        argmax = output["Terminal voltage [V] argmax"]
+        self.assertTrue(np.allclose(V[np.arange(len(V)), argmax], V.max(axis=1)))
+        # Statistics over a subset of the cells
+        cells = [3, 4, 5]
+        output = lp.solve(
+            netlist=self.netlist.copy(),
+            record_options={"summary": True, "cells": cells},
+            **kwargs,
+        )
+        a = output["Cell current [A] argmin"]
+        self.assertTrue(np.all(a == np.array(cells)[I[:, cells].argmin(axis=1)]))
+        # The size of the summary does not depend on the size of the pack
+        sizes = []
+        for Np, Ns in [(2, 1), (4, 3)]:
+            netlist = lp.setup_circuit(Np, Ns, I=20.0)
+            output = lp.solve(
+                netlist=netlist, record_options={"summary": True}, **kwargs
+            )
+            sizes.append(sum(v.nbytes for v in output.values()))
+        self.assertEqual(sizes[0], sizes[1])
+
+    def test_checkpoint_resume(self):
+        experiment = pybamm.Experiment(
+            ["Discharge at 20 A for 100 seconds", "Rest for 1 minutes"],
+            period="10 seconds",
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, "checkpoint.pkl")
+            output1 = lp.solve(
+                netlist=self.netlist.copy(),
+                parameter_values=self.parameter_values,
+                experiment=experiment,
+                initial_soc=0.5,
+                checkpoint_options={"path": checkpoint, "interval": 13},
+            )
+            # Continue from the last checkpoint at step 13
+            output2 = lp.resume(checkpoint)
+        for key in output1.keys():
+            self.assertTrue(np.allclose(output1[key], output2[key]))
+        # Problems that can't be pickled are rejected before the solve
+        parameter_values = self.parameter_values.copy()
+        parameter_values.update({"Ambient temperature [K]": lambda y, z, t: 298.15})
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, "checkpoint.pkl")
+            with self.assertRaises(ValueError):
+                lp.solve(
+                    netlist=self.netlist.copy(),
+                    parameter_values=parameter_values,
+                    experiment=experiment,
+                    initial_soc=0.5,
+                    checkpoint_options={"path": checkpoint},
+                )
+            self.assertFalse(os.path.exists(checkpoint))
+
+    def test_external_step(self):
+        netlist = lp.setup_circuit(Np=2, Ns=1, Rb=1e-4, Rc=1e-2, Ri=5e-2, V=3.6)
+        experiment = pybamm.Experiment(
+            ["Discharge at 5 A for 30 seconds"], period="10 seconds"
+        )
+        parameter_values = pybamm.ParameterValues("Chen2020")
+        T0 = parameter_values["Initial temperature [K]"]
+        inputs = {"Input temperature [K]": np.ones(2) * T0}
+        rm = lp.CasadiManager()
+        rm.solve(
+            netlist=netlist,
+            sim_func=lp.thermal_external,
+            parameter_values=parameter_values,
+            experiment=experiment,
+            inputs=inputs,
+            output_variables=["Volume-averaged cell temperature [K]"],
+            initial_soc=0.5,
+            nproc=1,
+            simlist=None,
+            setup_only=True,
+        )
+        input_array = np.ones([1, 2]) * T0
+        views = []
+        # Step past the end of the experiment
+        for _ in range(6):
+            input_array += 1.0
+            views.append(rm.step(5.0, input_array))
+        view = views[-1]
+        self.assertTrue(all(v is view for v in views))
+        self.assertIs(view["Cell current [A]"], rm.cell_current)
+        self.assertAlmostEqual(view["Time [s]"], 50.0)
+        self.assertAlmostEqual(view["Pack current [A]"], 5.0)
+        self.assertTrue(np.allclose(view["Cell current [A]"].sum(), 5.0))
+        T = view["Volume-averaged cell temperature [K]"]
+        self.assertTrue(np.allclose(T, T0 + 5.0))
+        output = rm.step_output()
+        self.assertEqual(output["Time [s]"].shape, (4,))
+
+    def test_observers(self):
+        netlist = lp.setup_circuit(Np=2, Ns=1, Rb=1e-4, Rc=1e-2, Ri=5e-2, V=3.6)
+        experiment = pybamm.Experiment(
+            ["Discharge at 5 A for 100 seconds", "Rest for 100 seconds"],
+            period="10 seconds",
+        )
+        times = []
+        voltages = []
+
+        def every_5(view):
+            times.append(view["Time [s]"])
+            with self.assertRaises(ValueError):
+                view["Terminal voltage [V]"][0] = 0.0
+
+        def stop_at_rest(view):
+            voltages.append(view["Node voltage [V]"].copy())
+            return view["Pack current [A]"] == 0.0
+
+        rm = lp.CasadiManager()
+        rm.add_observer(every_5, every=5)
+        rm.add_observer(stop_at_rest)
+        output = rm.solve(
+            netlist=netlist,
+            sim_func=None,
+            parameter_values=self.parameter_values,
+            experiment=experiment,
+            inputs=None,
+            output_variables=None,
+            initial_soc=0.5,
+            nproc=1,
+            simlist=None,
+        )
+        # The solve stops after the first step of the rest
+        self.assertEqual(len(output["Time [s]"]), 12)
+        self.assertEqual(len(voltages), 12)
+        self.assertTrue(np.allclose(times, [40.0, 90.0]))
+        rm.remove_observer(stop_at_rest)
+        self.assertEqual(len(rm.observers), 1)
+
+    def test_observer_interval(self):
+        netlist = lp.setup_circuit(Np=2, Ns=1, Rb=1e-4, Rc=1e-2, Ri=5e-2, V=3.6)
+        experiment = pybamm.Experiment(
+            ["Discharge at 5 A for 100 seconds"], period="10 seconds"
+        )
+        steps = []
+        rm = lp.CasadiManager()
+        rm.add_observer(lambda view: steps.append(view["Time [s]"]), interval=1e6)
+        rm.solve(
+            netlist=netlist,
+            sim_func=None,
+            parameter_values=self.parameter_values,
+            experiment=experiment,
+            inputs=None,
+            output_variables=None,
+            initial_soc=0.5,
+            nproc=1,
+            simlist=None,
+            setup_only=True,
+        )
+        # Stepping externally also calls the observers
+        for _ in range(3):
+            rm.step(5.0)
+        self.assertEqual(steps, [0.0])
+
+    def test_process_pool_worker_stopped(self):
+        netlist = lp.setup_circuit(Np=2, Ns=1, Rb=1e-4, Rc=1e-2, Ri=5e-2, V=3.6)
+        experiment = pybamm.Experiment(
+            ["Discharge at 5 A for 100 seconds"], period="10 seconds"
+        )
+        rm = lp.ProcessPoolManager()
+        rm.solve(
+            netlist=netlist,
+            sim_func=None,
+            parameter_values=self.parameter_values,
+            experiment=experiment,
+            inputs=None,
+            output_variables=None,
+            initial_soc=0.5,
+            nproc=2,
+            simlist=None,
+            setup_only=True,
+        )
+        rm.step(5.0)
+        rm.processes[0].kill()
+        rm.processes[0].join()
+        with self.assertRaisesRegex(RuntimeError, "workers \\[0\\] have stopped"):
+            rm.step(5.0)
+        self.assertEqual(rm.processes, [])
+
 
 if __name__ == "__main__":
     unittest.main()
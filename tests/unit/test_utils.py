@@ -3,6 +3,7 @@ import numpy as np
 import pandas as pd
 import pathlib
 import pybamm
+import shutil
 import unittest
 
 
@@ -15,6 +16,8 @@ class utilsTest(unittest.TestCase):
         self.currents = currents
         self.volts = volts
         self.output = output
+        self.time = np.arange(10.0) * 10
+        self.cells = np.random.rand(10, 3).astype(np.float32)
 
     def test_interp_current(self):
         d = {"Time": [0, 10], "Cells Total Current": [2.0, 4.0]}
@@ -22,6 +25,15 @@ class utilsTest(unittest.TestCase):
         f = lp.interp_current(df)
         assert f(5) == 3.0
 
+    def test_resample(self):
+        t = np.array([0.0, 10.0, 40.0])
+        values = np.array([[0.0, 1.0], [1.0, 2.0], [4.0, 5.0]])
+        t_new = np.arange(0.0, 50.0, 10.0)
+        resampled = lp.resample(t_new, t, values)
+        self.assertEqual(resampled.shape, (5, 2))
+        self.assertTrue(np.allclose(resampled[:, 0], [0.0, 1.0, 2.0, 3.0, 4.0]))
+        self.assertTrue(np.allclose(resampled[:, 1], resampled[:, 0] + 1))
+
     def test_add_events_to_model(self):
         model = pybamm.lithium_ion.SPMe()
         model = lp.add_events_to_model(model)
@@ -86,6 +98,60 @@ class utilsTest(unittest.TestCase):
         path = pathlib.Path("output.npz")
         path.unlink(missing_ok=True)
 
+        path = pathlib.Path("output.h5")
+        path.unlink(missing_ok=True)
+
+        path = pathlib.Path("variables.json")
+        path.unlink(missing_ok=True)
+
+        shutil.rmtree("parquet-results", ignore_errors=True)
+        shutil.rmtree("npy-results", ignore_errors=True)
+        shutil.rmtree("output", ignore_errors=True)
+
+    def test_save_to_parquet(self):
+        output = {"Time [s]": self.time, "Cell current [A]": self.cells}
+        lp.save_to_parquet(output, path="parquet-results", chunk_steps=4)
+        loaded = lp.load_output("parquet-results")
+        self.assertEqual(set(loaded.keys()), set(output.keys()))
+        currents = loaded["Cell current [A]"]
+        self.assertEqual(currents.shape, self.cells.shape)
+        self.assertTrue(np.array_equal(currents[5:11], self.cells[5:11]))
+        self.assertTrue(np.array_equal(currents[7, 2], self.cells[7, 2]))
+        self.assertTrue(np.array_equal(np.asarray(loaded["Time [s]"]), self.time))
+
+    def test_save_to_hdf5(self):
+        output = {"Time [s]": self.time, "Cell current [A]": self.cells}
+        lp.save_to_hdf5(output, path=".", chunk_steps=4)
+        with lp.load_output("output.h5") as loaded:
+            currents = loaded["Cell current [A]"]
+            self.assertEqual(currents.compression, "gzip")
+            self.assertTrue(np.array_equal(currents[5:11], self.cells[5:11]))
+            self.assertTrue(np.array_equal(currents[:], self.cells))
+            self.assertTrue(np.array_equal(loaded["Time [s]"][:], self.time))
+
+    def test_load_output(self):
+        output = {
+            "Time [s]": self.time,
+            "Cell current [A]": self.cells,
+            "X-averaged negative particle surface concentration [mol.m-3]": (
+                self.cells * 2
+            ),
+        }
+        formats = [
+            (lp.save_to_npy, "npy-results", "npy-results"),
+            (lp.save_to_npzcomp, "output", "output/output.npz"),
+            (lp.save_to_parquet, "parquet-results", "parquet-results"),
+            (lp.save_to_hdf5, "output", "output/output.h5"),
+        ]
+        for save, path, filename in formats:
+            save(output, path=path)
+            with lp.load_output(filename) as loaded:
+                self.assertEqual(set(loaded.keys()), set(output.keys()))
+                for key, value in output.items():
+                    self.assertTrue(np.array_equal(np.asarray(loaded[key]), value))
+        loaded = lp.load_output("npy-results")
+        self.assertIsInstance(loaded["Cell current [A]"], np.memmap)
+
 
 if __name__ == "__main__":
     unittest.main()